@@ -0,0 +1,198 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+
+# Admission limits (override through the environment)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_CONCURRENT_EXTRACTIONS = int(os.environ.get("MAX_CONCURRENT_EXTRACTIONS", os.cpu_count() or 2))
+MAX_QUEUED_EXTRACTIONS = int(os.environ.get("MAX_QUEUED_EXTRACTIONS", 16))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", 5))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# POST endpoints that take a place in the extraction queue
+ADMITTED_PATHS = ("/predict",)
+
+
+class AdmissionController:
+    """
+    Bounded work queue in front of the extraction (OCR) stage.
+
+    At most `max_concurrent` extractions run at once and at most
+    `max_queued` more may wait for a slot. Requests beyond that are
+    rejected immediately with 503 + Retry-After instead of piling up.
+    AdmissionMiddleware does the admit/release around each request, so a
+    rejection happens before any of the upload is read.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_EXTRACTIONS, max_queued=MAX_QUEUED_EXTRACTIONS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.admitted = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected_queue_full = 0
+        self.rejected_too_large = 0
+
+    @property
+    def queue_depth(self):
+        # Only requests waiting for an extraction slot; uploading or
+        # scoring requests are admitted but not queued
+        return self.waiting
+
+    def admit(self):
+        """
+        Reserve a place for one request. Returns False (and counts the
+        rejection) when the queue is full.
+        """
+        if self.admitted >= self.max_concurrent + self.max_queued:
+            self.rejected_queue_full += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.admitted -= 1
+
+    @asynccontextmanager
+    async def extraction_slot(self):
+        """
+        Wait for one of the limited extraction slots.
+        """
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_too_large": self.rejected_too_large,
+        }
+
+
+def upload_too_large():
+    admission.rejected_too_large += 1
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds maximum upload size of {MAX_UPLOAD_BYTES} bytes",
+    )
+
+
+class UploadLimitMiddleware:
+    """
+    Reject multipart uploads above MAX_UPLOAD_BYTES while the body is
+    still streaming in, before the form parser spools it to disk.
+    """
+
+    def __init__(self, app, max_upload_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_body_bytes = max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                response = JSONResponse({"detail": "Invalid Content-Length header"},
+                                        status_code=status.HTTP_400_BAD_REQUEST)
+                return await response(scope, receive, send)
+            if declared > self.max_body_bytes:
+                return await self._reject(scope, receive, send)
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes and not response_started:
+                    # Answer 413 now and make the app see a disconnect
+                    rejected = True
+                    await self._reject(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    async def _reject(self, scope, receive, send):
+        error = upload_too_large()
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+        await response(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    """
+    Take a place in the extraction queue for POSTs to `paths` before the
+    request body is read, answering 503 + Retry-After when it is full.
+    The place is released once the response has been sent.
+    """
+
+    def __init__(self, app, controller=None, paths=ADMITTED_PATHS):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        controller = self.controller or admission
+        if not controller.admit():
+            response = JSONResponse(
+                {"detail": "Server busy, extraction queue is full"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
+
+
+# Shared controller for the upload/OCR path
+admission = AdmissionController()
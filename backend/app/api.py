@@ -1,16 +1,30 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Security, status, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Security, status, Depends, Request, Query
 from fastapi.security import APIKeyHeader
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, Union
+import asyncio
+import csv
+import io
 import os
-import shutil
-import pandas as pd
+import numpy as np
 from ml_pipeline.ingestion import extract_text_from_file
-from ml_pipeline.features import preprocess_claim
-from ml_pipeline.predict import detector
-from .schemas import ClaimPredictionResponse, FeedbackRequest, FeedbackResponse, ClaimStats
+from ml_pipeline.features import clean_text, extract_entities, compute_features_batch, CostOutlierModel, COST_OUTLIER_FIT_SAMPLE
+from ml_pipeline.predict import detector, risk_from_anomaly, risk_label, thresholds
+from ml_pipeline.calibration import load_thresholds
+from ml_pipeline.drift import DriftMonitor
+from ml_pipeline.dedup import MinHashLSHIndex
+from ml_pipeline.sketches import PeerCostIndex
+from ml_pipeline.graph import CooccurrenceGraph
+from .schemas import (
+    ClaimPredictionResponse, ClaimEntities, FeedbackRequest, FeedbackResponse, FeedbackBatchRequest,
+    FeedbackBatchResponse, ClaimStats, ClaimRecord, AdmissionStats, DriftReport, ThresholdConfig,
+    HistoryReloadResponse,
+)
+from .admission import admission, upload_too_large, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+from .repository import create_repository, DATABASE_PATH, CLAIM_COLUMNS
+from .events import broker, claims_event
 import tempfile
-import sqlite3
-from datetime import datetime
 
 
 # Security
@@ -28,65 +42,207 @@ async def get_api_key(key: str = Security(api_key_header)):
 
 router = APIRouter(dependencies=[Depends(get_api_key)])
 
-# Database setup
-DATABASE_PATH = "data/claims.db"
-
-def init_db():
-    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS claims (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            doctor TEXT,
-            diagnosis TEXT,
-            cost REAL,
-            risk_score REAL,
-            prediction TEXT,
-            is_fraud INTEGER DEFAULT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def get_historical_data():
-    if not os.path.exists(DATABASE_PATH):
-        return pd.DataFrame()
-    conn = sqlite3.connect(DATABASE_PATH)
-    try:
-        df = pd.read_sql_query("SELECT doctor, diagnosis, cost FROM claims", conn)
-    except:
-        df = pd.DataFrame()
-    conn.close()
-    return df
-
-def save_claim(entities, risk_score, prediction):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO claims (doctor, diagnosis, cost, risk_score, prediction)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (entities.get('doctor'), entities.get('diagnosis'), entities.get('cost'), risk_score, prediction))
-    claim_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return claim_id
+# Storage backend (SQLite by default, see repository.BACKENDS)
+repository = create_repository()
+
+# Peer-group cost sketches, built by load_history and updated on every insert
+peer_index = PeerCostIndex()
+
+# Doctor <-> diagnosis co-occurrence counts, same lifecycle as peer_index
+graph = CooccurrenceGraph()
+
+# While load_history runs: (claim_id, entities) stored meanwhile, replayed
+# on top of the rebuilt structures if its snapshot missed them
+history_backlog = None
+history_reload_lock = asyncio.Lock()
+
+# MinHash LSH index of extracted claim text, kept next to the claims database
+LSH_INDEX_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "lsh_index.db")
+lsh_index = MinHashLSHIndex(LSH_INDEX_PATH)
+
+# Online drift of the model inputs against the training scaler statistics
+drift_monitor = DriftMonitor.from_scaler(detector.scaler, detector.feature_names) if detector.scaler is not None else None
+
+# Cost outlier model shared by all requests, refitted on the most recent
+# COST_OUTLIER_FIT_SAMPLE costs
+# every COST_OUTLIER_REFIT_CLAIMS stored claims
+COST_OUTLIER_REFIT_CLAIMS = int(os.environ.get("COST_OUTLIER_REFIT_CLAIMS", 1000))
+cost_outlier_model = None
+claims_since_outlier_fit = 0
+# Only one request refits; the others wait and reuse its model
+cost_outlier_refit_lock = asyncio.Lock()
+
+# Largest array accepted by /score
+MAX_SCORE_BATCH = int(os.environ.get("MAX_SCORE_BATCH", 5000))
+
+# Largest page returned by /claims, and rows fetched per query by /claims/export
+MAX_CLAIMS_PAGE = 1000
+EXPORT_PAGE_SIZE = 5000
+
+def _cost_outlier_refit_due():
+    return cost_outlier_model is None or claims_since_outlier_fit >= COST_OUTLIER_REFIT_CLAIMS
+
+async def get_cost_outlier_model():
+    global cost_outlier_model, claims_since_outlier_fit
+    if _cost_outlier_refit_due():
+        async with cost_outlier_refit_lock:
+            # Re-check: a request that held the lock may have just refitted
+            if _cost_outlier_refit_due():
+                costs = await repository.get_recent_costs(COST_OUTLIER_FIT_SAMPLE)
+                model = await run_in_threadpool(CostOutlierModel, costs)
+                cost_outlier_model, claims_since_outlier_fit = model, 0
+    return cost_outlier_model
+
+async def save_claims(claims):
+    """
+    Persist (entities, risk_score, prediction, anomaly_score) tuples in one
+    write job and update the in-memory history structures.
+    """
+    global claims_since_outlier_fit
+    claim_ids = await repository.save_claims(claims)
+    for claim_id, (entities, *_) in zip(claim_ids, claims):
+        peer_index.update(entities)
+        graph.add_claim(entities)
+        if history_backlog is not None:
+            history_backlog.append((claim_id, entities))
+    claims_since_outlier_fit += len(claims)
+    return claim_ids
+
+def validate_entities(entities):
+    """
+    Pre-Risk Validation Layer: list what is missing before a claim can be scored.
+    """
+    issues = []
+    if not entities.get('doctor'):
+        issues.append("Missing Doctor Name")
+    if not entities.get('diagnosis'):
+        issues.append("Missing Diagnosis")
+    if entities.get('cost') is None:
+        issues.append("Missing Cost")
+    return issues
+
+async def score_claims(entities_list, near_duplicate_ids_list=None, explain=False):
+    """
+    Compute features for already-extracted claims, score the complete ones
+    with one batched forward pass and persist them. Shared by /predict and
+    /score so both store exactly the same thing. Returns (responses, claim_ids)
+    where claim_ids[i] is None for claims that were not stored.
+    """
+    near_duplicate_ids_list = near_duplicate_ids_list or [[] for _ in entities_list]
+    outlier_model = await get_cost_outlier_model()
+    features_list = compute_features_batch(
+        entities_list,
+        cost_outlier_model=outlier_model,
+        near_duplicate_ids_list=near_duplicate_ids_list,
+        peer_index=peer_index,
+        graph=graph,
+    )
+    issues_list = [validate_entities(entities) for entities in entities_list]
+    complete = [i for i, issues in enumerate(issues_list) if not issues]
+
+    # Advanced Risk Analysis using Autoencoder
+    # The detector returns a reconstruction error (MSE Loss) per claim
+    explanations = {}
+    if explain:
+        raw_scores, contributions = detector.explain_batch([features_list[i] for i in complete])
+        raw_scores = np.asarray(raw_scores, dtype=float)
+        explanations = dict(zip(complete, contributions))
+    else:
+        raw_scores = np.asarray(detector.predict_batch([features_list[i] for i in complete]), dtype=float)
+
+    # If model is not loaded (returns 0 cost/fallback), the cost outlier heuristic is used
+    outlier_scores = [features_list[i]['cost_outlier_score'] for i in complete]
+    risk_scores = np.atleast_1d(risk_from_anomaly(raw_scores, outlier_scores)) if complete else []
+    predictions = np.atleast_1d(risk_label(risk_scores)) if complete else []
+    if drift_monitor is not None:
+        for i in complete:
+            drift_monitor.update(features_list[i])
+
+    # Save to database
+    stored_ids = await save_claims([
+        (entities_list[i], float(risk_scores[n]), str(predictions[n]), float(raw_scores[n]))
+        for n, i in enumerate(complete)
+    ]) if complete else []
+
+    claim_ids = [None] * len(entities_list)
+    scored = {}
+    for n, i in enumerate(complete):
+        claim_ids[i] = stored_ids[n]
+        scored[i] = (float(risk_scores[n]), str(predictions[n]))
+
+    # Push the committed batch to live dashboard streams
+    if complete:
+        broker.publish("claims", claims_event([
+            (claim_ids[i], entities_list[i], *scored[i]) for i in complete
+        ]))
+
+    responses = []
+    for i, entities in enumerate(entities_list):
+        risk_score, prediction = scored.get(i, (None, None))
+        responses.append(ClaimPredictionResponse(
+            claim_id=claim_ids[i],
+            entities=entities,
+            features=features_list[i] if i in scored else None,
+            risk_score=risk_score,
+            prediction=prediction,
+            status="Complete" if i in scored else "Incomplete",
+            issues=issues_list[i],
+            explanation=explanations.get(i),
+            near_duplicate_ids=near_duplicate_ids_list[i],
+            threshold_version=thresholds["version"] if i in scored else None
+        ))
+    return responses, claim_ids
+
+async def load_history():
+    """
+    Build the peer-group cost sketches and the doctor-diagnosis graph from
+    the hot claims table, at startup and after archiving. The new structures
+    are filled off to the side and swapped in at once; claims stored while
+    the rows were loading are replayed unless the snapshot already had them.
+    Returns the newest claim id in the snapshot.
+    """
+    global peer_index, graph, history_backlog
+    async with history_reload_lock:
+        history_backlog = []
+        try:
+            new_peer_index, new_graph = PeerCostIndex(), CooccurrenceGraph()
+            last_claim_id = await repository.get_history(new_peer_index, new_graph)
+            # No await from here on, so no claim can slip in between
+            for claim_id, entities in history_backlog:
+                if claim_id > last_claim_id:
+                    new_peer_index.update(entities)
+                    new_graph.add_claim(entities)
+            peer_index, graph = new_peer_index, new_graph
+        finally:
+            history_backlog = None
+    return last_claim_id
 
 @router.on_event("startup")
 async def startup_event():
-    init_db()
+    # Pick up the latest calibrated threshold config
+    thresholds.update(load_thresholds())
+    await repository.init()
+    await load_history()
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    await repository.close()
+    lsh_index.close()
 
 @router.post("/predict", response_model=ClaimPredictionResponse)
-async def predict_fraud(file: UploadFile = File(...)):
+async def predict_fraud(file: UploadFile = File(...), explain: bool = False):
     """
     Endpoint to upload a claim file and get fraud prediction.
+    With ?explain=true the response also carries each model input's
+    contribution to the anomaly score.
     """
+    # The place in the bounded work queue is taken by AdmissionMiddleware
+    # before the upload is read (503 + Retry-After when full)
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    # Save uploaded file temporarily
     # Save uploaded file temporarily using streaming to prevent DoS
+    temp_path = None
     try:
         suffix = os.path.splitext(file.filename)[1]
         # Basic extension validation
@@ -94,21 +250,29 @@ async def predict_fraud(file: UploadFile = File(...)):
              raise HTTPException(status_code=400, detail="Unsupported file format")
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            # Stream the file content to disk
-            shutil.copyfileobj(file.file, temp_file)
             temp_path = temp_file.name
-    except HTTPException:
-        raise
+            # Stream the file content to disk, enforcing the size limit as we go
+            written = 0
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise upload_too_large()
+                temp_file.write(chunk)
     except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail="Error handling file upload")
 
     try:
-        # Extract text
-        try:
-            text = extract_text_from_file(temp_path)
-        except Exception as  ocr_error:
-            print(f"OCR Failed: {ocr_error}")
-            text = "" # Fallback to empty text
+        # Extract text (off the event loop, limited to MAX_CONCURRENT_EXTRACTIONS at once)
+        async with admission.extraction_slot():
+            try:
+                text = await run_in_threadpool(extract_text_from_file, temp_path)
+            except Exception as  ocr_error:
+                print(f"OCR Failed: {ocr_error}")
+                text = "" # Fallback to empty text
             
         if not text:
              # If text is empty (either OCR failed or file empty)
@@ -125,56 +289,18 @@ async def predict_fraud(file: UploadFile = File(...)):
                 issues=validation_issues
             )
 
-        # Get historical data
-        historical_data = get_historical_data()
+        # Look up stored claims with nearly the same text
+        signature = lsh_index.hasher.signature(text)
+        near_duplicates = await run_in_threadpool(lsh_index.query, signature)
+        near_duplicate_ids = [claim_id for claim_id, _ in near_duplicates]
 
-        # Preprocess and get features
-        entities, features = preprocess_claim(text, historical_data if not historical_data.empty else None)
+        # Extract entities, then validate, score and store
+        entities = extract_entities(clean_text(text))
+        responses, claim_ids = await score_claims([entities], [near_duplicate_ids], explain)
+        if claim_ids[0] is not None:
+            await run_in_threadpool(lsh_index.insert, claim_ids[0], signature)
 
-        # Pre-Risk Validation Layer
-        validation_issues = []
-        if not entities.get('doctor'):
-            validation_issues.append("Missing Doctor Name")
-        if not entities.get('diagnosis'):
-            validation_issues.append("Missing Diagnosis")
-        if entities.get('cost') is None:
-            validation_issues.append("Missing Cost")
-            
-        # Determine Status
-        if validation_issues:
-            status_summary = "Incomplete"
-            risk_score = None
-            prediction = None
-            # We might still want to return features if possible, or just None
-        else:
-            status_summary = "Complete"
-            
-            # Advanced Risk Analysis using Autoencoder
-            # The detector returns a reconstruction error (MSE Loss). 
-            # We normalize this for display (assuming loss > 1.0 is very high anomaly)
-            raw_anomaly_score = detector.predict(features)
-            
-            # If model is not loaded (returns 0 cost/fallback), use heuristic
-            if raw_anomaly_score == 0 and 'cost_outlier_score' in features:
-                 # Heuristic fallback
-                 risk_score = min(1.0, max(0.0, (features.get('cost_outlier_score', 0) + 1) / 2))
-            else:
-                 # Normalize MSE loss to 0-1 range (Experimental saturation at 2.0 MSE)
-                 risk_score = min(1.0, raw_anomaly_score / 2.0)
-    
-            prediction = "High Risk" if risk_score > 0.5 else "Low Risk"
-    
-            # Save to database
-            save_claim(entities, risk_score, prediction)
-
-        return ClaimPredictionResponse(
-            entities=entities,
-            features=features if status_summary == "Complete" else None,
-            risk_score=risk_score,
-            prediction=prediction,
-            status=status_summary,
-            issues=validation_issues
-        )
+        return responses[0]
 
     except HTTPException:
         raise
@@ -185,75 +311,191 @@ async def predict_fraud(file: UploadFile = File(...)):
         print(f"Internal Error in predict: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     finally:
-        if os.path.exists(temp_path):
+        if temp_path and os.path.exists(temp_path):
             os.unlink(temp_path)
 
+@router.post("/score", response_model=Union[ClaimPredictionResponse, list[ClaimPredictionResponse]])
+async def score_structured(claims: Union[ClaimEntities, list[ClaimEntities]], explain: bool = False):
+    """
+    Endpoint to score claims that arrive already parsed (e.g. EDI feeds),
+    skipping upload and OCR. Accepts one claim object or an array of them
+    and stores complete claims exactly like /predict.
+    """
+    single = isinstance(claims, ClaimEntities)
+    batch = [claims] if single else claims
+    if len(batch) > MAX_SCORE_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SCORE_BATCH} claims per request")
+
+    try:
+        responses, _ = await score_claims([claim.normalized() for claim in batch], explain=explain)
+        return responses[0] if single else responses
+    except Exception as e:
+        print(f"Internal Error in score: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/metrics/admission", response_model=AdmissionStats)
+async def get_admission_stats():
+    """
+    Endpoint exposing upload/OCR queue depth and rejection counts (for autoscaling).
+    """
+    return AdmissionStats(**admission.stats())
+
+@router.get("/drift", response_model=DriftReport)
+async def get_drift_report():
+    """
+    Endpoint reporting drift (PSI/KS) of model inputs against the training reference.
+    """
+    if drift_monitor is None:
+        raise HTTPException(status_code=503, detail="Model not loaded, no training reference available")
+    return DriftReport(**drift_monitor.report())
+
+@router.get("/thresholds", response_model=ThresholdConfig)
+async def get_thresholds():
+    """
+    Endpoint returning the risk threshold config currently in use.
+    """
+    return ThresholdConfig(**thresholds)
+
 @router.get("/stats", response_model=ClaimStats)
 async def get_claim_stats():
     """
     Endpoint to get statistics about processed claims.
     """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Get total claims
-        cursor.execute("SELECT COUNT(*) FROM claims")
-        result = cursor.fetchone()
-        total_claims = result[0] if result else 0
-
-        # Get risk distribution
-        cursor.execute("SELECT COUNT(*) FROM claims WHERE risk_score > 0.6")
-        result = cursor.fetchone()
-        high_risk_claims = result[0] if result else 0
-
-        cursor.execute("SELECT COUNT(*) FROM claims WHERE risk_score <= 0.6")
-        result = cursor.fetchone()
-        low_risk_claims = result[0] if result else 0
-
-        # Get average risk score
-        cursor.execute("SELECT AVG(risk_score) FROM claims")
-        result = cursor.fetchone()
-        average_risk_score = result[0] if result and result[0] is not None else 0.0
-
-        # Get top doctors
-        cursor.execute("SELECT doctor, COUNT(*) as count FROM claims WHERE doctor IS NOT NULL GROUP BY doctor ORDER BY count DESC LIMIT 5")
-        top_doctors = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Get top diagnoses
-        cursor.execute("SELECT diagnosis, COUNT(*) as count FROM claims WHERE diagnosis IS NOT NULL GROUP BY diagnosis ORDER BY count DESC LIMIT 5")
-        top_diagnoses = {row[0]: row[1] for row in cursor.fetchall()}
-
-        conn.close()
-
-        return ClaimStats(
-            total_claims=total_claims,
-            high_risk_claims=high_risk_claims,
-            low_risk_claims=low_risk_claims,
-            average_risk_score=average_risk_score,
-            top_doctors=top_doctors,
-            top_diagnoses=top_diagnoses
-        )
+        stats = await repository.get_stats(thresholds["high_risk_threshold"])
+        return ClaimStats(**stats)
 
     except Exception as e:
         print(f"Internal Error in stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events stream for live dashboards: one "snapshot" event
+    with the full /stats numbers (all doctors and diagnoses), then a
+    "claims" event per stored batch carrying the new claims and their stats
+    delta. Replaces polling /stats.
+    """
+    queue = broker.subscribe()
+    try:
+        snapshot = await repository.get_stats(thresholds["high_risk_threshold"], top_n=None)
+    except Exception as e:
+        broker.unsubscribe(queue)
+        print(f"Internal Error in events: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    return StreamingResponse(
+        broker.stream(queue, snapshot, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/claims", response_model=list[ClaimRecord])
+async def list_claims(
+    include_archive: bool = False,
+    doctor: Optional[str] = None,
+    diagnosis: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_CLAIMS_PAGE),
+):
+    """
+    Endpoint to browse stored claims, newest first. Only the hot partition
+    is read unless include_archive=true. since/until compare against
+    created_at ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS", UTC); pass the last
+    id of a page as before_id to get the next one.
+    """
+    try:
+        rows = await repository.get_claims(include_archive, doctor, diagnosis, since, until, before_id, limit)
+        return [ClaimRecord(**row) for row in rows]
+    except Exception as e:
+        print(f"Internal Error in claims: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/claims/export")
+async def export_claims(
+    include_archive: bool = False,
+    doctor: Optional[str] = None,
+    diagnosis: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """
+    Endpoint to download matching claims as CSV (same filters as /claims),
+    streamed page by page so large exports never sit in memory.
+    """
+    async def rows():
+        header = io.StringIO()
+        csv.writer(header).writerow(CLAIM_COLUMNS + ("archived",))
+        yield header.getvalue()
+        before_id = None
+        while True:
+            page = await repository.get_claims(include_archive, doctor, diagnosis, since, until,
+                                               before_id, EXPORT_PAGE_SIZE)
+            if not page:
+                break
+            chunk = io.StringIO()
+            writer = csv.writer(chunk)
+            for row in page:
+                writer.writerow(row.values())
+            yield chunk.getvalue()
+            before_id = page[-1]["id"]
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=claims.csv"},
+    )
+
 @router.post("/feedback", response_model=FeedbackResponse)
 async def submit_feedback(feedback: FeedbackRequest):
     """
     Endpoint to submit feedback on a claim.
     """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE claims SET is_fraud = ? WHERE id = ?
-        ''', (1 if feedback.is_fraud else 0, feedback.claim_id))
-        conn.commit()
-        conn.close()
+        updated = await repository.set_feedback(feedback.claim_id, feedback.is_fraud)
+        if not updated:
+            # Unknown id, or the claim has been moved to the archive
+            raise HTTPException(status_code=404, detail=f"Claim {feedback.claim_id} not found among hot claims")
 
         return FeedbackResponse(message=f"Feedback for claim {feedback.claim_id} recorded: {'Fraud' if feedback.is_fraud else 'Valid'}")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Internal Error in feedback: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/feedback/batch", response_model=FeedbackBatchResponse)
+async def submit_feedback_batch(batch: FeedbackBatchRequest):
+    """
+    Endpoint to label many claims at once (applied in a single transaction).
+    """
+    try:
+        labels = [(item.claim_id, item.is_fraud) for item in batch.items]
+        updated = await repository.set_feedback_batch(labels)
+
+        return FeedbackBatchResponse(
+            updated=updated,
+            message=f"Feedback recorded for {updated} of {len(labels)} claims"
+        )
+    except Exception as e:
+        print(f"Internal Error in feedback batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/admin/reload-history", response_model=HistoryReloadResponse)
+async def reload_history():
+    """
+    Rebuild the in-memory claim history (peer cost sketches, doctor-diagnosis
+    graph) from the hot table. Call after archiving old claims.
+    """
+    try:
+        last_claim_id = await load_history()
+        return HistoryReloadResponse(
+            last_claim_id=last_claim_id,
+            message=f"History rebuilt from hot claims up to claim {last_claim_id}"
+        )
+    except Exception as e:
+        print(f"Internal Error in history reload: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
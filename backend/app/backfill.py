@@ -0,0 +1,229 @@
+"""
+Rescore stored claims after a model or normalization change.
+
+Reads claims in id-ordered chunks, recomputes model inputs for the whole
+chunk at once, scores them with one batched forward pass and writes
+risk_score / prediction / anomaly_score back in one transaction per chunk.
+Progress is checkpointed in the same transaction, so an interrupted run
+resumes where it stopped.
+
+    python -m backend.app.backfill --chunk-size 10000 --max-rows-per-second 5000
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+import numpy as np
+from ml_pipeline.predict import detector, MODEL_PATH, SCALER_PATH, risk_from_anomaly, risk_label
+from ml_pipeline.calibration import THRESHOLDS_PATH
+from ml_pipeline.sketches import PeerCostIndex, PEER_GROUPS
+from ml_pipeline.graph import CooccurrenceGraph
+from ml_pipeline.features import CostOutlierModel, COST_OUTLIER_FIT_SAMPLE
+from ml_pipeline.feature_registry import FeatureSchemaError
+from .repository import DATABASE_PATH, create_schema
+
+BACKFILL_CHUNK_SIZE = 10000
+GRAPH_FEATURES = ("doctor_frequency", "diagnosis_frequency", "pair_frequency",
+                  "doctor_diagnosis_share", "pair_rarity")
+# Model inputs _History can rebuild from the claims table; near_duplicate_count
+# would need the text signatures in lsh_index.db, which the backfill does not read
+BACKFILL_FEATURES = ("cost", "cost_outlier_score") + GRAPH_FEATURES + tuple(
+    f"{group}_cost_percentile" for group in PEER_GROUPS
+)
+
+
+def model_fingerprint():
+    """
+    Short hash of the model, scaler and threshold config, so each model
+    version gets its own checkpoint.
+    """
+    digest = hashlib.sha1()
+    for path in (MODEL_PATH, SCALER_PATH, THRESHOLDS_PATH):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class _History:
+    """
+    Table-wide aggregates the per-claim features are computed against,
+    gathered once per run with GROUP BY queries instead of per claim.
+    """
+
+    def __init__(self, conn, needed):
+        self.graph = CooccurrenceGraph()
+        self.graph.load(conn.execute(
+            "SELECT doctor, diagnosis, COUNT(*) FROM claims GROUP BY doctor, diagnosis"
+        ))
+        self.outlier_model = None
+        if "cost_outlier_score" in needed:
+            self.outlier_model = CostOutlierModel([row[0] for row in conn.execute(
+                "SELECT cost FROM claims WHERE cost IS NOT NULL ORDER BY id DESC LIMIT ?", (COST_OUTLIER_FIT_SAMPLE,)
+            )])
+        self.peer_index = None
+        if any(f"{group}_cost_percentile" in needed for group in PEER_GROUPS):
+            self.peer_index = PeerCostIndex()
+            self.peer_index.load(conn.execute(
+                "SELECT doctor, diagnosis, cost FROM claims WHERE cost IS NOT NULL"
+            ))
+
+    def columns(self, doctors, diagnoses, costs, needed):
+        """
+        Model inputs for a chunk of stored claims. The aggregates include
+        those claims, so each one's own contribution is taken out to match
+        what an identical new claim would get.
+        """
+        columns = {"cost": costs}
+        graph_features = [
+            self.graph.features(doctor, diagnosis, exclude_self=True) for doctor, diagnosis in zip(doctors, diagnoses)
+        ]
+        for name in GRAPH_FEATURES:
+            columns[name] = np.array([f[name] for f in graph_features], dtype=float)
+        if "cost_outlier_score" in needed:
+            columns["cost_outlier_score"] = self.outlier_model.score_many(costs)
+        for group, keys in (("doctor", doctors), ("diagnosis", diagnoses)):
+            name = f"{group}_cost_percentile"
+            if name in needed:
+                values = [
+                    self.peer_index.percentile(group, key, cost, exclude_self=True) for key, cost in zip(keys, costs)
+                ]
+                columns[name] = np.array([0.5 if v is None else v for v in values], dtype=float)
+        return columns
+
+
+def _create_checkpoint_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            rows_done INTEGER NOT NULL,
+            finished INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def run_backfill(db_path=DATABASE_PATH, chunk_size=BACKFILL_CHUNK_SIZE, max_rows_per_second=None,
+                 job=None, restart=False, log=print):
+    """
+    Rescore every stored claim with a known cost. Returns a summary dict
+    with rows processed, elapsed time and throughput. Raises
+    FeatureSchemaError if the model needs an input the backfill cannot
+    recompute (see BACKFILL_FEATURES).
+    """
+    # Model inputs come from the schema stored with the model artifact
+    unsupported = [name for name in detector.feature_names if name not in BACKFILL_FEATURES]
+    if unsupported:
+        raise FeatureSchemaError(
+            f"The backfill cannot recompute {', '.join(unsupported)} for stored claims; "
+            f"retrain without it or rescore those claims through the API"
+        )
+
+    job = job or f"rescore-{model_fingerprint()}"
+    # Generous busy timeout so the job waits out live group commits
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    create_schema(conn)
+    _create_checkpoint_table(conn)
+
+    if restart:
+        conn.execute("DELETE FROM backfill_checkpoints WHERE job = ?", (job,))
+        conn.commit()
+    row = conn.execute("SELECT last_id, rows_done, finished FROM backfill_checkpoints WHERE job = ?", (job,)).fetchone()
+    last_id, rows_done, finished = row if row else (0, 0, 0)
+    if finished:
+        log(f"Backfill job {job} already finished ({rows_done} rows); use --restart to run it again.")
+        conn.close()
+        return {"job": job, "rows": 0, "seconds": 0.0, "rows_per_second": 0.0}
+    if last_id:
+        log(f"Resuming backfill job {job} after claim {last_id} ({rows_done} rows already done)")
+
+    needed = set(detector.feature_names)
+    if detector.model is None:
+        needed.add("cost_outlier_score")
+    history = _History(conn, needed)
+
+    started = time.perf_counter()
+    processed = 0
+    while True:
+        chunk_started = time.perf_counter()
+        rows = conn.execute('''
+            SELECT id, doctor, diagnosis, cost FROM claims
+            WHERE id > ? AND cost IS NOT NULL ORDER BY id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        ids, doctors, diagnoses, costs = zip(*rows)
+        costs = np.array(costs, dtype=float)
+        columns = history.columns(doctors, diagnoses, costs, needed)
+
+        if detector.model is not None:
+            raw = detector.score_matrix(np.column_stack([columns[name] for name in detector.feature_names]))
+        else:
+            raw = np.zeros(len(ids))
+        risk = risk_from_anomaly(raw, columns.get("cost_outlier_score", 0.0))
+        labels = risk_label(risk)
+
+        last_id = ids[-1]
+        rows_done += len(ids)
+        with conn:
+            conn.executemany(
+                "UPDATE claims SET risk_score = ?, prediction = ?, anomaly_score = ? WHERE id = ?",
+                zip(risk.tolist(), labels.tolist(), raw.tolist(), ids),
+            )
+            conn.execute('''
+                INSERT INTO backfill_checkpoints (job, last_id, rows_done) VALUES (?, ?, ?)
+                ON CONFLICT(job) DO UPDATE SET last_id = excluded.last_id,
+                    rows_done = excluded.rows_done, updated_at = CURRENT_TIMESTAMP
+            ''', (job, last_id, rows_done))
+
+        processed += len(ids)
+        elapsed = time.perf_counter() - started
+        log(f"{rows_done} rows rescored (up to claim {last_id}), {processed / elapsed:,.0f} rows/s")
+
+        # Rate limit: stretch each chunk to at least len(chunk) / max_rows_per_second
+        if max_rows_per_second:
+            budget = len(ids) / max_rows_per_second
+            spent = time.perf_counter() - chunk_started
+            if spent < budget:
+                time.sleep(budget - spent)
+
+    with conn:
+        conn.execute('''
+            INSERT INTO backfill_checkpoints (job, last_id, rows_done, finished) VALUES (?, ?, ?, 1)
+            ON CONFLICT(job) DO UPDATE SET finished = 1, updated_at = CURRENT_TIMESTAMP
+        ''', (job, last_id, rows_done))
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "job": job,
+        "rows": processed,
+        "seconds": elapsed,
+        "rows_per_second": processed / elapsed if elapsed > 0 else 0.0,
+    }
+    log(f"Backfill {job} finished: {processed} rows in {elapsed:.1f}s ({summary['rows_per_second']:,.0f} rows/s)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore stored claims with the current model.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Path to claims.db")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--max-rows-per-second", type=float, default=None,
+                        help="Throttle to leave headroom for live traffic")
+    parser.add_argument("--job", default=None, help="Checkpoint name (default: derived from the model artifacts)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint for this job")
+    args = parser.parse_args()
+    try:
+        run_backfill(args.db, args.chunk_size, args.max_rows_per_second, args.job, args.restart)
+    except FeatureSchemaError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+
+
+# Per-subscriber buffer; a subscriber that falls this far behind loses its oldest events
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", 1000))
+# Seconds between SSE keep-alive comments on an idle stream
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+class EventBroker:
+    """
+    In-process fan-out of scored-claim events to stream subscribers.
+
+    publish() never blocks or touches the database: each subscriber has a
+    bounded queue, so the cost of a new claim is one put per open stream.
+    """
+
+    def __init__(self, max_queue=EVENT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type, data):
+        event = (event_type, data)
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    async def stream(self, queue, snapshot, is_disconnected, keepalive=EVENT_KEEPALIVE_SECONDS):
+        """
+        SSE body for one subscriber: the snapshot first, then every event
+        from `queue`. The queue must be subscribed before the snapshot is
+        read; batches the snapshot already counts are skipped by claim id.
+        """
+        try:
+            yield format_sse("snapshot", snapshot)
+            while not await is_disconnected():
+                try:
+                    event_type, data = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event_type == "claims" and data["last_claim_id"] <= snapshot["last_claim_id"]:
+                    continue
+                yield format_sse(event_type, data)
+        finally:
+            self.unsubscribe(queue)
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def claims_event(stored):
+    """
+    Payload of one "claims" event for a committed batch of
+    (claim_id, entities, risk_score, prediction) tuples: the claims
+    themselves plus the delta they add to /stats, so subscribers can keep
+    their totals current without querying it again.
+    """
+    claims = []
+    delta = {
+        "total_claims": 0,
+        "high_risk_claims": 0,
+        "low_risk_claims": 0,
+        "risk_score_sum": 0.0,
+        "doctors": {},
+        "diagnoses": {},
+    }
+    for claim_id, entities, risk_score, prediction in stored:
+        claims.append({
+            "claim_id": claim_id,
+            "doctor": entities.get('doctor'),
+            "diagnosis": entities.get('diagnosis'),
+            "cost": entities.get('cost'),
+            "risk_score": risk_score,
+            "prediction": prediction,
+        })
+        delta["total_claims"] += 1
+        if prediction == "High Risk":
+            delta["high_risk_claims"] += 1
+        else:
+            delta["low_risk_claims"] += 1
+        delta["risk_score_sum"] += risk_score
+        for key, field in (("doctors", 'doctor'), ("diagnoses", 'diagnosis')):
+            name = entities.get(field)
+            if name:
+                delta[key][name] = delta[key].get(name, 0) + 1
+    return {
+        "last_claim_id": max(claim_id for claim_id, *_ in stored),
+        "claims": claims,
+        "delta": delta,
+    }
+
+
+# Shared broker for the API process
+broker = EventBroker()
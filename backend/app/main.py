@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from .api import router
+from .admission import UploadLimitMiddleware, AdmissionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(title="Claim Fraud Detection API", version="0.1.0")
@@ -12,6 +13,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(UploadLimitMiddleware)
+# Outermost, so a full queue is answered before any of the body is read
+app.add_middleware(AdmissionMiddleware)
+
 app.include_router(router)
 
 if __name__ == "__main__":
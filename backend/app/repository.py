@@ -0,0 +1,502 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+
+# Database configuration (override through the environment)
+DATABASE_BACKEND = os.environ.get("DATABASE_BACKEND", "sqlite")
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "data/claims.db")
+# Group commit: writes arriving within this window (or up to this many
+# rows) share one transaction and one fsync
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("GROUP_COMMIT_WINDOW_MS", 5))
+GROUP_COMMIT_MAX_ROWS = int(os.environ.get("GROUP_COMMIT_MAX_ROWS", 256))
+# Reader threads, each with its own WAL connection, so slow reads
+# (/stats, exports) neither block inserts nor each other
+READ_CONNECTIONS = int(os.environ.get("READ_CONNECTIONS", 2))
+# Cold partition that backend.app.retention moves old claims into
+# (default: claims_archive.db next to the claims database)
+ARCHIVE_DATABASE_PATH = os.environ.get("ARCHIVE_DATABASE_PATH")
+
+def archive_path_for(db_path):
+    return ARCHIVE_DATABASE_PATH or os.path.join(os.path.dirname(db_path), "claims_archive.db")
+
+
+class ClaimRepository(ABC):
+    """
+    Async storage interface used by the API handlers.
+
+    Every method is a coroutine so endpoint code never blocks the event
+    loop, whatever the backend does underneath. New backends subclass
+    this and register themselves in BACKENDS; a backend that leaves a
+    method out fails when it is constructed.
+    """
+
+    @abstractmethod
+    async def init(self):
+        """Create the schema if needed and get ready to serve calls."""
+
+    @abstractmethod
+    async def close(self):
+        """Flush pending writes and release connections."""
+
+    @abstractmethod
+    async def save_claims(self, claims):
+        """Insert (entities, risk_score, prediction, anomaly_score) tuples; return their ids in order."""
+
+    @abstractmethod
+    async def set_feedback(self, claim_id, is_fraud):
+        """Label one claim; return 1 if it was updated, 0 if it is not in the hot table."""
+
+    @abstractmethod
+    async def set_feedback_batch(self, labels):
+        """Apply (claim_id, is_fraud) pairs; return how many claims were updated."""
+
+    @abstractmethod
+    async def get_recent_costs(self, limit):
+        """Return up to `limit` of the most recent known costs."""
+
+    @abstractmethod
+    async def get_history(self, peer_index, graph):
+        """
+        Load the hot claims into peer_index (PeerCostIndex.load: doctor,
+        diagnosis, cost rows with a known cost) and graph
+        (CooccurrenceGraph.load: grouped doctor, diagnosis, count rows) from
+        one snapshot, streaming rows instead of materializing the table.
+        Return the newest claim id in that snapshot.
+        """
+
+    @abstractmethod
+    async def get_stats(self, high_risk_threshold, top_n=5):
+        """
+        Return the aggregate numbers behind ClaimStats as a dict, with the
+        top_n doctors and diagnoses (all of them when top_n is None).
+        Archived claims count through their rollups.
+        """
+
+    @abstractmethod
+    async def get_claims(self, include_archive=False, doctor=None, diagnosis=None, since=None, until=None,
+                         before_id=None, limit=100):
+        """
+        Return stored claims as dicts, newest first, optionally including
+        the archive partition. Page with before_id (the last id returned).
+        """
+
+
+_STOP = object()
+
+
+class SQLiteClaimRepository(ClaimRepository):
+    """
+    SQLite backend driven by dedicated DB threads.
+
+    One writer thread owns the only write connection and executes write
+    jobs in order; `read_connections` reader threads each hold their own
+    WAL connection for queries. Callers await a future, so the event loop
+    keeps serving other requests while SQLite does I/O, and a slow read
+    never holds up inserts.
+
+    Writes are group-committed: consecutive write jobs are collected for
+    up to `commit_window_ms` or until they touch `commit_max_rows` rows,
+    and committed in a single transaction; each job runs in a savepoint
+    nested inside it. A write's future resolves only after its
+    transaction commits, and close() flushes everything still queued.
+    Each read job runs in its own read transaction, so it sees one
+    consistent committed snapshot.
+    """
+
+    def __init__(self, path=DATABASE_PATH, commit_window_ms=GROUP_COMMIT_WINDOW_MS,
+                 commit_max_rows=GROUP_COMMIT_MAX_ROWS, archive_path=None, read_connections=READ_CONNECTIONS):
+        self.path = path
+        self.archive_path = archive_path or archive_path_for(path)
+        self.commit_window = commit_window_ms / 1000.0
+        self.commit_max_rows = commit_max_rows
+        self.read_connections = max(1, read_connections)
+        self.commits = 0
+        self._jobs = queue.Queue()
+        self._read_jobs = queue.Queue()
+        self._threads = []
+        self._writer_ready = threading.Event()
+        self._lock = threading.Lock()
+
+    # -- DB threads ----------------------------------------------------
+
+    def _ensure_thread(self):
+        with self._lock:
+            if not self._threads:
+                self._writer_ready.clear()
+                self._threads = [threading.Thread(target=self._worker, name="claims-db-writer", daemon=True)]
+                self._threads += [
+                    threading.Thread(target=self._reader, name=f"claims-db-reader-{n}", daemon=True)
+                    for n in range(self.read_connections)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        # WAL lets readers (dashboards, backfills) run alongside the writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_schema(conn)
+        # Archived claims are only read by explorer/export queries
+        attach_archive(conn, self.archive_path)
+        return conn
+
+    def _connect_reader(self):
+        # The writer creates and migrates the schema; readers only attach
+        self._writer_ready.wait()
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _fail_jobs(self, jobs, error):
+        """
+        The connection could not be opened: fail every queued and later
+        job with the error until close(), instead of leaving callers hanging.
+        """
+        job = jobs.get()
+        while job is not _STOP:
+            future = job[2]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+            job = jobs.get()
+
+    def _worker(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            print(f"Database connection failed: {e}")
+            self._writer_ready.set()
+            return self._fail_jobs(self._jobs, e)
+        self._writer_ready.set()
+        try:
+            job = self._jobs.get()
+            while job is not _STOP:
+                batch, job = self._collect_writes(job)
+                self._commit_writes(conn, batch)
+                if job is None:
+                    job = self._jobs.get()
+        finally:
+            conn.close()
+
+    def _reader(self):
+        try:
+            # Autocommit mode, so each job can open its own read transaction
+            conn = self._connect_reader()
+        except Exception as e:
+            print(f"Database connection failed: {e}")
+            return self._fail_jobs(self._read_jobs, e)
+        try:
+            job = self._read_jobs.get()
+            while job is not _STOP:
+                fn, args, future, _ = job
+                if future.set_running_or_notify_cancel():
+                    try:
+                        conn.execute("BEGIN")
+                        try:
+                            future.set_result(fn(conn, *args))
+                        finally:
+                            conn.execute("COMMIT")
+                    except BaseException as e:
+                        if not future.done():
+                            future.set_exception(e)
+                job = self._read_jobs.get()
+        finally:
+            conn.close()
+
+    def _collect_writes(self, first):
+        """
+        Gather write jobs until the window closes or the batch is full.
+        Returns (batch, next_job) where next_job is _STOP if close() ended
+        the batch early (None otherwise).
+        """
+        batch = [first]
+        rows = first[3]
+        deadline = time.monotonic() + self.commit_window
+        while rows < self.commit_max_rows:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._jobs.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if job is _STOP:
+                return batch, job
+            batch.append(job)
+            rows += job[3]
+        return batch, None
+
+    def _commit_writes(self, conn, batch):
+        done = []
+        # Open the shared transaction first: a savepoint outside one would
+        # start (and its RELEASE commit) a transaction of its own
+        conn.execute("BEGIN")
+        for fn, args, future, _ in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            # A job that fails partway must leave nothing in the shared transaction
+            conn.execute("SAVEPOINT write_job")
+            try:
+                result = fn(conn, *args)
+            except BaseException as e:
+                conn.execute("ROLLBACK TO write_job")
+                conn.execute("RELEASE write_job")
+                future.set_exception(e)
+                continue
+            conn.execute("RELEASE write_job")
+            done.append((future, result))
+        try:
+            conn.commit()
+        except BaseException as e:
+            conn.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        for future, result in done:
+            future.set_result(result)
+
+    def _submit(self, jobs, fn, args, rows=1):
+        self._ensure_thread()
+        future = Future()
+        jobs.put((fn, args, future, rows))
+        return asyncio.wrap_future(future)
+
+    def _run(self, fn, *args):
+        """
+        Queue the read fn(conn, *args) on a reader thread and return an awaitable.
+        """
+        return self._submit(self._read_jobs, fn, args)
+
+    def _run_write(self, fn, *args, rows=1):
+        """
+        Queue fn(conn, *args) on the writer thread; fn only executes
+        statements and is committed together with neighbouring writes.
+        `rows` is how many rows it writes, counted against commit_max_rows.
+        """
+        return self._submit(self._jobs, fn, args, rows)
+
+    # -- ClaimRepository -----------------------------------------------
+
+    async def init(self):
+        # The writer creates the schema when it connects
+        await self._run_write(_ping)
+
+    async def close(self):
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+        if threads:
+            self._jobs.put(_STOP)
+            for _ in threads[1:]:
+                self._read_jobs.put(_STOP)
+            await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+
+    async def save_claims(self, claims):
+        return await self._run_write(_insert_claims, claims, rows=len(claims))
+
+    async def set_feedback(self, claim_id, is_fraud):
+        return await self._run_write(_update_feedback, [(claim_id, is_fraud)])
+
+    async def set_feedback_batch(self, labels):
+        return await self._run_write(_update_feedback, labels, rows=len(labels))
+
+    async def get_recent_costs(self, limit):
+        return await self._run(_recent_costs, limit)
+
+    async def get_history(self, peer_index, graph):
+        return await self._run(_history, peer_index, graph)
+
+    async def get_stats(self, high_risk_threshold, top_n=5):
+        return await self._run(_stats, high_risk_threshold, top_n)
+
+    async def get_claims(self, include_archive=False, doctor=None, diagnosis=None, since=None, until=None,
+                         before_id=None, limit=100):
+        return await self._run(_claims, include_archive, doctor, diagnosis, since, until, before_id, limit)
+
+
+# SQL used by the SQLite backend (each runs on the DB thread)
+
+# (name, definition) of columns added to claims after the original schema
+ADDED_COLUMNS = [
+    ("anomaly_score", "REAL"),  # raw reconstruction error behind risk_score
+]
+
+# Columns copied to the archive and returned by explorer queries
+CLAIM_COLUMNS = ("id", "doctor", "diagnosis", "cost", "risk_score", "prediction", "is_fraud",
+                 "created_at", "anomaly_score")
+
+def create_schema(conn, database="main"):
+    """
+    Create the claims table (and, in the main database, claim_rollups).
+    database="archive" creates the same claims table in an attached archive.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {database}.claims (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor TEXT,
+            diagnosis TEXT,
+            cost REAL,
+            risk_score REAL,
+            prediction TEXT,
+            is_fraud INTEGER DEFAULT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Columns added after the original schema
+    columns = {row[1] for row in conn.execute(f"PRAGMA {database}.table_info(claims)")}
+    for name, definition in ADDED_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE {database}.claims ADD COLUMN {name} {definition}")
+    if database == "main":
+        # Per day/doctor/diagnosis totals of archived claims ('' = missing value)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS claim_rollups (
+                day TEXT NOT NULL,
+                doctor TEXT NOT NULL,
+                diagnosis TEXT NOT NULL,
+                claims INTEGER NOT NULL,
+                cost_sum REAL NOT NULL,
+                risk_claims INTEGER NOT NULL,
+                risk_sum REAL NOT NULL,
+                high_risk INTEGER NOT NULL,
+                PRIMARY KEY (day, doctor, diagnosis)
+            )
+        ''')
+    conn.commit()
+
+def attach_archive(conn, archive_path):
+    directory = os.path.dirname(archive_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    create_schema(conn, "archive")
+
+def _ping(conn):
+    return None
+
+def _insert_claim(conn, entities, risk_score, prediction, anomaly_score):
+    cursor = conn.execute('''
+        INSERT INTO claims (doctor, diagnosis, cost, risk_score, prediction, anomaly_score)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (entities.get('doctor'), entities.get('diagnosis'), entities.get('cost'), risk_score, prediction, anomaly_score))
+    return cursor.lastrowid
+
+def _insert_claims(conn, claims):
+    return [_insert_claim(conn, *claim) for claim in claims]
+
+def _update_feedback(conn, labels):
+    cursor = conn.executemany('''
+        UPDATE claims SET is_fraud = ? WHERE id = ?
+    ''', [(1 if is_fraud else 0, claim_id) for claim_id, is_fraud in labels])
+    return cursor.rowcount
+
+def _recent_costs(conn, limit):
+    return [row[0] for row in conn.execute(
+        "SELECT cost FROM claims WHERE cost IS NOT NULL ORDER BY id DESC LIMIT ?", (limit,)
+    )]
+
+def _history(conn, peer_index, graph):
+    # Runs in one read transaction, so the id and both loads agree. The
+    # structures consume the cursors row by row on this reader thread.
+    last_claim_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM claims").fetchone()[0]
+    peer_index.load(conn.execute("SELECT doctor, diagnosis, cost FROM claims WHERE cost IS NOT NULL"))
+    graph.load(conn.execute("SELECT doctor, diagnosis, COUNT(*) FROM claims GROUP BY doctor, diagnosis"))
+    return last_claim_id
+
+def _stats(conn, high_risk_threshold, top_n=5):
+    cursor = conn.cursor()
+
+    # Hot claims plus the rollups of archived ones (high/low risk of archived
+    # claims follows the label they had when archived)
+    cursor.execute('''
+        SELECT COUNT(*), COUNT(CASE WHEN risk_score > ? THEN 1 END), COUNT(CASE WHEN risk_score <= ? THEN 1 END),
+               COUNT(risk_score), TOTAL(risk_score)
+        FROM claims
+    ''', (high_risk_threshold, high_risk_threshold))
+    total_claims, high_risk_claims, low_risk_claims, risk_claims, risk_sum = cursor.fetchone()
+
+    cursor.execute("SELECT TOTAL(claims), TOTAL(high_risk), TOTAL(risk_claims), TOTAL(risk_sum) FROM claim_rollups")
+    archived, archived_high, archived_risk_claims, archived_risk_sum = cursor.fetchone()
+    total_claims += int(archived)
+    high_risk_claims += int(archived_high)
+    low_risk_claims += int(archived_risk_claims - archived_high)
+    risk_claims += int(archived_risk_claims)
+    risk_sum += archived_risk_sum
+
+    # Get average risk score
+    average_risk_score = risk_sum / risk_claims if risk_claims else 0.0
+
+    # LIMIT -1 means no limit in SQLite
+    limit = top_n if top_n is not None else -1
+
+    # Get top doctors / diagnoses
+    top = {}
+    for field in ("doctor", "diagnosis"):
+        cursor.execute(f'''
+            SELECT {field}, SUM(count) AS count FROM (
+                SELECT {field}, COUNT(*) AS count FROM claims WHERE {field} IS NOT NULL GROUP BY {field}
+                UNION ALL
+                SELECT {field}, SUM(claims) FROM claim_rollups WHERE {field} != '' GROUP BY {field}
+            ) GROUP BY {field} ORDER BY count DESC LIMIT ?
+        ''', (limit,))
+        top[field] = {row[0]: row[1] for row in cursor.fetchall()}
+
+    # Newest claim counted above (claims committed later have larger ids)
+    cursor.execute("SELECT MAX(id) FROM claims")
+    last_claim_id = cursor.fetchone()[0] or 0
+
+    return {
+        "total_claims": total_claims,
+        "high_risk_claims": high_risk_claims,
+        "low_risk_claims": low_risk_claims,
+        "average_risk_score": average_risk_score,
+        "top_doctors": top["doctor"],
+        "top_diagnoses": top["diagnosis"],
+        "last_claim_id": last_claim_id,
+    }
+
+def _claims(conn, include_archive, doctor, diagnosis, since, until, before_id, limit):
+    conditions, params = [], []
+    for clause, value in (("doctor = ?", doctor), ("diagnosis = ?", diagnosis), ("created_at >= ?", since),
+                          ("created_at < ?", until), ("id < ?", before_id)):
+        if value is not None:
+            conditions.append(clause)
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = ", ".join(CLAIM_COLUMNS)
+
+    query = f"SELECT {columns}, 0 AS archived FROM main.claims {where}"
+    if include_archive:
+        query += f" UNION ALL SELECT {columns}, 1 FROM archive.claims {where}"
+        params = params * 2
+    query += " ORDER BY id DESC LIMIT ?"
+
+    names = CLAIM_COLUMNS + ("archived",)
+    return [dict(zip(names, row)) for row in conn.execute(query, params + [limit])]
+
+
+# Registered backends; a server database adds its ClaimRepository subclass here
+BACKENDS = {
+    "sqlite": SQLiteClaimRepository,
+}
+
+def create_repository(backend=DATABASE_BACKEND, **kwargs):
+    try:
+        repository_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown DATABASE_BACKEND '{backend}'. Available: {', '.join(BACKENDS)}")
+    return repository_class(**kwargs)
@@ -0,0 +1,102 @@
+"""
+Move claims older than a retention window out of the hot claims table.
+
+History-based features, /stats and the backfill only read the hot
+partition (data/claims.db). Older claims are copied to the archive
+partition (claims_archive.db next to it, or ARCHIVE_DATABASE_PATH) and
+their counts, costs and risk totals are added to claim_rollups in the hot
+database, so /stats still covers them. Archived claims stay reachable via
+GET /claims?include_archive=true and GET /claims/export.
+
+    python -m backend.app.retention --days 90 --vacuum
+
+Then POST /admin/reload-history so the API rebuilds its in-memory history
+(peer cost sketches, doctor-diagnosis graph) from the hot partition only;
+until then the archived claims still count towards history-based features.
+"""
+import argparse
+import os
+import sqlite3
+from .repository import DATABASE_PATH, CLAIM_COLUMNS, archive_path_for, attach_archive, create_schema
+
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", 90))
+RETENTION_CHUNK_SIZE = 10000
+
+
+def archive_claims(db_path=DATABASE_PATH, archive_path=None, days=RETENTION_DAYS,
+                   chunk_size=RETENTION_CHUNK_SIZE, vacuum=False, log=print):
+    """
+    Archive every claim created more than `days` days ago. Returns a
+    summary dict with the number of claims moved and the cutoff used.
+
+    Each chunk is first copied to the archive (INSERT OR IGNORE on the
+    claim id) and then rolled up and deleted from the hot table in one
+    transaction. The two files commit separately, so an interrupted run
+    leaves at worst a claim in both partitions; running again finishes it.
+    """
+    archive_path = archive_path or archive_path_for(db_path)
+    # Generous busy timeout so the job waits out live group commits
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    create_schema(conn)
+    attach_archive(conn, archive_path)
+
+    cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{days} days",)).fetchone()[0]
+    columns = ", ".join(CLAIM_COLUMNS)
+    chunk = "id BETWEEN ? AND ? AND created_at < ?"
+
+    moved = 0
+    while True:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM main.claims WHERE created_at < ? ORDER BY id LIMIT ?", (cutoff, chunk_size)
+        )]
+        if not ids:
+            break
+        bounds = (ids[0], ids[-1], cutoff)
+
+        with conn:
+            conn.execute(f'''
+                INSERT OR IGNORE INTO archive.claims ({columns})
+                SELECT {columns} FROM main.claims WHERE {chunk}
+            ''', bounds)
+        with conn:
+            conn.execute(f'''
+                INSERT INTO claim_rollups (day, doctor, diagnosis, claims, cost_sum, risk_claims, risk_sum, high_risk)
+                SELECT date(created_at), IFNULL(doctor, ''), IFNULL(diagnosis, ''), COUNT(*), TOTAL(cost),
+                       COUNT(risk_score), TOTAL(risk_score), COUNT(CASE WHEN prediction = 'High Risk' THEN 1 END)
+                FROM main.claims WHERE {chunk}
+                GROUP BY 1, 2, 3
+                ON CONFLICT(day, doctor, diagnosis) DO UPDATE SET
+                    claims = claims + excluded.claims,
+                    cost_sum = cost_sum + excluded.cost_sum,
+                    risk_claims = risk_claims + excluded.risk_claims,
+                    risk_sum = risk_sum + excluded.risk_sum,
+                    high_risk = high_risk + excluded.high_risk
+            ''', bounds)
+            conn.execute(f"DELETE FROM main.claims WHERE {chunk}", bounds)
+
+        moved += len(ids)
+        log(f"{moved} claims archived (up to claim {ids[-1]})")
+
+    if vacuum and moved:
+        # Give the freed pages back to the filesystem
+        conn.execute("VACUUM main")
+    conn.close()
+
+    log(f"Archived {moved} claims created before {cutoff} to {archive_path}")
+    return {"moved": moved, "cutoff": cutoff, "archive_path": archive_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old claims from the hot table into the archive.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Path to claims.db")
+    parser.add_argument("--archive", default=None, help="Archive database (default: claims_archive.db next to --db)")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Keep claims newer than this in the hot table")
+    parser.add_argument("--chunk-size", type=int, default=RETENTION_CHUNK_SIZE)
+    parser.add_argument("--vacuum", action="store_true", help="Shrink claims.db after archiving")
+    args = parser.parse_args()
+    archive_claims(args.db, args.archive, args.days, args.chunk_size, args.vacuum)
+
+
+if __name__ == "__main__":
+    main()
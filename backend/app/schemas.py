@@ -1,13 +1,34 @@
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from ml_pipeline.features import clean_text
 
 class ClaimPredictionResponse(BaseModel):
+    claim_id: Optional[int] = None # Set once the claim is stored ("Complete" only)
     entities: Dict[str, Any]
     features: Optional[Dict[str, Any]] = None
     risk_score: Optional[float] = None
     prediction: Optional[str] = None
     status: str # "Complete", "Incomplete", "Low Quality"
     issues: list[str] = []
+    explanation: Optional[Dict[str, float]] = None # Per-feature score contributions (?explain=true)
+    near_duplicate_ids: list[int] = [] # Stored claims with nearly identical text
+    threshold_version: Optional[int] = None # Threshold config used for risk_score/prediction
+
+class ClaimEntities(BaseModel):
+    doctor: Optional[str] = None
+    diagnosis: Optional[str] = None
+    cost: Optional[float] = None
+
+    def normalized(self):
+        """
+        Entities normalized the same way OCR-extracted ones are, so peer
+        groups and graph nodes line up across /predict and /score.
+        """
+        return {
+            'doctor': clean_text(self.doctor) or None if self.doctor else None,
+            'diagnosis': clean_text(self.diagnosis) or None if self.diagnosis else None,
+            'cost': self.cost,
+        }
 
 class FeedbackRequest(BaseModel):
     claim_id: int
@@ -16,6 +37,17 @@ class FeedbackRequest(BaseModel):
 class FeedbackResponse(BaseModel):
     message: str
 
+class HistoryReloadResponse(BaseModel):
+    last_claim_id: int # Newest claim in the snapshot the history was rebuilt from
+    message: str
+
+class FeedbackBatchRequest(BaseModel):
+    items: list[FeedbackRequest]
+
+class FeedbackBatchResponse(BaseModel):
+    updated: int
+    message: str
+
 class ClaimStats(BaseModel):
     total_claims: int
     high_risk_claims: int
@@ -23,3 +55,55 @@ class ClaimStats(BaseModel):
     average_risk_score: float
     top_doctors: Dict[str, int]
     top_diagnoses: Dict[str, int]
+    last_claim_id: int = 0 # Newest claim included in these numbers
+
+
+class ClaimRecord(BaseModel):
+    id: int
+    doctor: Optional[str] = None
+    diagnosis: Optional[str] = None
+    cost: Optional[float] = None
+    risk_score: Optional[float] = None
+    prediction: Optional[str] = None
+    is_fraud: Optional[bool] = None
+    created_at: str
+    anomaly_score: Optional[float] = None
+    archived: bool # True when read from the archive partition
+
+class AdmissionStats(BaseModel):
+    queue_depth: int # Requests waiting for an extraction slot
+    admitted: int # Requests holding a place (uploading, queued, extracting or scoring)
+    in_flight: int
+    max_concurrent: int
+    max_queued: int
+    completed: int
+    rejected_queue_full: int
+    rejected_too_large: int
+
+class FeatureDrift(BaseModel):
+    count: int
+    mean: float
+    std: float
+    reference_mean: float
+    reference_std: float
+    psi: float
+    ks: float
+    ks_critical: float
+    histogram: list[int]
+    drifted: bool
+
+class DriftReport(BaseModel):
+    features: Dict[str, FeatureDrift]
+    retrain_recommended: bool
+
+class ThresholdConfig(BaseModel):
+    version: int
+    high_risk_threshold: float
+    risk_saturation_mse: float
+    created_at: Optional[str] = None
+    alert_rate: Optional[float] = None
+    min_precision: Optional[float] = None
+    claims: Optional[int] = None
+    expected_alert_rate: Optional[float] = None
+    quantiles: Optional[Dict[str, float]] = None
+    feedback: Optional[Dict[str, Any]] = None
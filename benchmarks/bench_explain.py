@@ -0,0 +1,60 @@
+"""
+Measure the per-request overhead of ?explain=true.
+
+Run from the repository root:
+    python benchmarks/bench_explain.py
+
+Exits with status 1 if explain() costs more than MAX_EXPLAIN_OVERHEAD
+over predict().
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ml_pipeline.predict import detector
+
+N_CALLS = 2000
+# explain() reuses predict()'s single forward pass; allow timing noise on top
+MAX_EXPLAIN_OVERHEAD = 0.25
+FEATURES = {"cost": 450.0, "doctor_frequency": 3, "diagnosis_frequency": 12, "cost_outlier_score": 0.02}
+
+
+def time_per_call(fn, n=N_CALLS):
+    fn(FEATURES)  # warm-up
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(FEATURES)
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    if detector.model is None:
+        print("Model not found; run ml_pipeline/train.py first.")
+        return
+
+    predict_s = time_per_call(detector.predict)
+    explain_s = time_per_call(detector.explain)
+    print(f"predict: {predict_s * 1e6:8.1f} us/call")
+    print(f"explain: {explain_s * 1e6:8.1f} us/call")
+    overhead = explain_s / predict_s - 1
+    print(f"overhead: {overhead * 100:+.1f}% (bound {MAX_EXPLAIN_OVERHEAD * 100:.0f}%)")
+    if overhead > MAX_EXPLAIN_OVERHEAD:
+        print("explain overhead exceeds the bound")
+        sys.exit(1)
+
+    try:
+        import shap  # noqa: F401
+    except ImportError:
+        print("shap not installed; skipping KernelSHAP batch timing.")
+        return
+    batch = [FEATURES] * 32
+    start = time.perf_counter()
+    detector.explain_shap(batch)
+    shap_s = (time.perf_counter() - start) / len(batch)
+    print(f"shap (batch of {len(batch)}): {shap_s * 1e3:8.1f} ms/claim")
+
+
+if __name__ == "__main__":
+    main()
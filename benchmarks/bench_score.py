@@ -0,0 +1,51 @@
+"""
+Measure /score throughput for bulk structured claims.
+
+Run from the repository root (writes to a temporary database):
+    python benchmarks/bench_score.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "claims.db"))
+
+from fastapi.testclient import TestClient
+from backend.app.main import app
+
+HEADERS = {"x-api-key": "secret-token"}
+BATCH_SIZE = 1000
+N_BATCHES = 10
+
+
+def make_batch(rng):
+    return [
+        {
+            "doctor": f"doctor {rng.randint(1, 200)}",
+            "diagnosis": f"diagnosis {rng.randint(1, 50)}",
+            "cost": round(rng.lognormvariate(5.5, 0.6), 2),
+        }
+        for _ in range(BATCH_SIZE)
+    ]
+
+
+def main():
+    rng = random.Random(0)
+    with TestClient(app) as client:
+        client.post("/score", json=make_batch(rng), headers=HEADERS)  # warm-up
+        batches = [make_batch(rng) for _ in range(N_BATCHES)]
+        start = time.perf_counter()
+        for batch in batches:
+            response = client.post("/score", json=batch, headers=HEADERS)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+    total = BATCH_SIZE * N_BATCHES
+    print(f"/score: {total} claims in {elapsed:.2f}s ({total / elapsed:,.0f} claims/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,27 @@ import requests
 import pandas as pd
 import json
 from io import BytesIO
+from live_feed import LiveStats
 
 # Backend API URL
 
 # Backend API URL
 API_URL = "http://127.0.0.1:8000"
 HEADERS = {"x-api-key": "secret-token"}
+# Longest the analytics page waits for new events before rerunning; kept
+# short so navigation and other widget interactions are picked up promptly
+LIVE_REDRAW_TIMEOUT = 1
+
+@st.cache_resource
+def get_live_stats():
+    return LiveStats(API_URL, HEADERS).start()
 
 st.set_page_config(page_title="Claim Fraud Detection", layout="wide")
 
 st.title("🏥 Medical Claim Fraud Detection System")
 
 # Sidebar for navigation
-page = st.sidebar.selectbox("Navigation", ["Submit Claim", "Dashboard Analytics"])
+page = st.sidebar.selectbox("Navigation", ["Submit Claim", "Dashboard Analytics", "Model Drift"])
 
 if page == "Submit Claim":
     st.header("Upload Claim Form")
@@ -77,12 +85,7 @@ if page == "Submit Claim":
                             submit_feedback = st.form_submit_button("Submit Feedback")
                             
                             if submit_feedback:
-                                # We need a claim ID to submit feedback. 
-                                # For this simple MVP, we'll assume the backend exposes it or we just fire a dummy one
-                                # In a real app we'd get the ID back from the predict response.
-                                # Let's assume the API returns it or we just mock it for now as the current predict schema didn't include ID explicitly but we can fix that later.
-                                # Wait, I didn't add claim_id to the response schema. I should probably fix that or just pass 0 for now.
-                                feedback_data = {"claim_id": 1, "is_fraud": is_fraud} # Placeholder ID
+                                feedback_data = {"claim_id": data.get("claim_id"), "is_fraud": is_fraud}
                                 try:
                                     fb_response = requests.post(f"{API_URL}/feedback", json=feedback_data, headers=HEADERS)
                                     if fb_response.status_code == 200:
@@ -102,33 +105,83 @@ if page == "Submit Claim":
 
 elif page == "Dashboard Analytics":
     st.header("System Analytics")
-    
+
+    # One shared stream subscription per dashboard server, not one /stats
+    # query per viewer per refresh
+    live = get_live_stats()
+    stats = live.snapshot()
+    if not stats["connected"]:
+        st.error(stats["error"] or "Connecting to live stream...")
+
+    # Key Metrics
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Claims", stats["total_claims"])
+    col2.metric("High Risk Claims", stats["high_risk_claims"])
+    col3.metric("Low Risk Claims", stats["low_risk_claims"])
+    col4.metric("Avg Risk Score", f"{stats['average_risk_score']:.2f}")
+
+    # Charts
+    st.subheader("Top Doctors by Claim Volume")
+    if stats["top_doctors"]:
+        st.bar_chart(stats["top_doctors"])
+    else:
+        st.info("No data available yet.")
+
+    st.subheader("Top Diagnoses")
+    if stats["top_diagnoses"]:
+        st.bar_chart(stats["top_diagnoses"])
+    else:
+        st.info("No data available yet.")
+
+    st.subheader("Live High-Risk Claims")
+    if stats["high_risk_feed"]:
+        st.dataframe(pd.DataFrame(stats["high_risk_feed"]), use_container_width=True)
+    else:
+        st.info("No high-risk claims since the dashboard connected.")
+
+    # Wait briefly for the stream to deliver something new, then rerun the
+    # script instead of looping, so Streamlit can handle other interactions
+    live.wait_for_change(stats["version"], timeout=LIVE_REDRAW_TIMEOUT)
+    st.rerun()
+
+elif page == "Model Drift":
+    st.header("Model Input Drift")
+
     try:
-        response = requests.get(f"{API_URL}/stats", headers=HEADERS)
+        response = requests.get(f"{API_URL}/drift", headers=HEADERS)
         if response.status_code == 200:
-            stats = response.json()
-            
-            # Key Metrics
-            col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Total Claims", stats["total_claims"])
-            col2.metric("High Risk Claims", stats["high_risk_claims"])
-            col3.metric("Low Risk Claims", stats["low_risk_claims"])
-            col4.metric("Avg Risk Score", f"{stats['average_risk_score']:.2f}")
-            
-            # Charts
-            st.subheader("Top Doctors by Claim Volume")
-            if stats["top_doctors"]:
-                st.bar_chart(stats["top_doctors"])
-            else:
-                st.info("No data available yet.")
-                
-            st.subheader("Top Diagnoses")
-            if stats["top_diagnoses"]:
-                st.bar_chart(stats["top_diagnoses"])
+            report = response.json()
+
+            if report["retrain_recommended"]:
+                st.error("⚠️ Production inputs have drifted from the training data. Consider retraining.")
             else:
-                st.info("No data available yet.")
-                
+                st.success("✅ No significant drift detected.")
+
+            rows = []
+            for name, drift in report["features"].items():
+                rows.append({
+                    "Feature": name,
+                    "Claims Seen": drift["count"],
+                    "Mean": drift["mean"],
+                    "Training Mean": drift["reference_mean"],
+                    "Std": drift["std"],
+                    "Training Std": drift["reference_std"],
+                    "PSI": drift["psi"],
+                    "KS": drift["ks"],
+                    "Drifted": drift["drifted"],
+                })
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+            st.subheader("PSI by Feature")
+            st.bar_chart({row["Feature"]: row["PSI"] for row in rows})
+
+            for name, drift in report["features"].items():
+                st.subheader(f"{name}: share of claims per training-decile bin")
+                total = max(drift["count"], 1)
+                st.bar_chart([count / total for count in drift["histogram"]])
+        elif response.status_code == 503:
+            st.info("Model not loaded; drift monitoring is unavailable.")
         else:
-            st.error("Failed to fetch statistics.")
+            st.error("Failed to fetch drift report.")
     except requests.exceptions.ConnectionError:
         st.error("Could not connect to backend API. Is it running?")
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+import requests
+
+# Recent high-risk claims kept for the live feed
+FEED_SIZE = 50
+# Seconds to wait before reconnecting a dropped stream
+RECONNECT_SECONDS = 3
+
+
+class LiveStats:
+    """
+    Dashboard-side copy of /stats kept current from the /events stream.
+
+    A background thread holds one streaming connection to the backend; it
+    applies the initial snapshot and then each batch delta, so rendering
+    the dashboard reads memory instead of querying the API. One instance is
+    shared by every open dashboard session.
+    """
+
+    def __init__(self, api_url, headers, feed_size=FEED_SIZE):
+        self.api_url = api_url
+        self.headers = headers
+        self.connected = False
+        self.error = None
+        self.total_claims = 0
+        self.high_risk_claims = 0
+        self.low_risk_claims = 0
+        self.risk_score_sum = 0.0
+        self.doctors = Counter()
+        self.diagnoses = Counter()
+        self.high_risk_feed = deque(maxlen=feed_size)
+        self.version = 0
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._listen, name="live-stats", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def apply_snapshot(self, stats):
+        with self._changed:
+            self.total_claims = stats["total_claims"]
+            self.high_risk_claims = stats["high_risk_claims"]
+            self.low_risk_claims = stats["low_risk_claims"]
+            self.risk_score_sum = stats["average_risk_score"] * stats["total_claims"]
+            self.doctors = Counter(stats["top_doctors"])
+            self.diagnoses = Counter(stats["top_diagnoses"])
+            self._bump()
+
+    def apply_claims(self, event):
+        delta = event["delta"]
+        with self._changed:
+            self.total_claims += delta["total_claims"]
+            self.high_risk_claims += delta["high_risk_claims"]
+            self.low_risk_claims += delta["low_risk_claims"]
+            self.risk_score_sum += delta["risk_score_sum"]
+            self.doctors.update(delta["doctors"])
+            self.diagnoses.update(delta["diagnoses"])
+            for claim in event["claims"]:
+                if claim["prediction"] == "High Risk":
+                    self.high_risk_feed.appendleft(claim)
+            self._bump()
+
+    def snapshot(self, top_n=5):
+        """
+        Current numbers in the /stats response shape, plus the high-risk feed.
+        """
+        with self._changed:
+            return {
+                "total_claims": self.total_claims,
+                "high_risk_claims": self.high_risk_claims,
+                "low_risk_claims": self.low_risk_claims,
+                "average_risk_score": self.risk_score_sum / self.total_claims if self.total_claims else 0.0,
+                "top_doctors": dict(self.doctors.most_common(top_n)),
+                "top_diagnoses": dict(self.diagnoses.most_common(top_n)),
+                "high_risk_feed": list(self.high_risk_feed),
+                "connected": self.connected,
+                "error": self.error,
+                "version": self.version,
+            }
+
+    def wait_for_change(self, version, timeout=None):
+        """
+        Block until the state moves past `version` (or timeout); returns the new version.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def _bump(self):
+        self.version += 1
+        self._changed.notify_all()
+
+    def _set_connection(self, connected, error=None):
+        with self._changed:
+            self.connected = connected
+            self.error = error
+            self._bump()
+
+    def _listen(self):
+        while True:
+            try:
+                with requests.get(f"{self.api_url}/events", headers=self.headers, stream=True,
+                                  timeout=(5, None)) as response:
+                    response.raise_for_status()
+                    self._set_connection(True)
+                    self._consume(response.iter_lines(decode_unicode=True))
+                self._set_connection(False, "Stream closed by the backend")
+            except requests.exceptions.ConnectionError:
+                self._set_connection(False, "Could not connect to backend API. Is it running?")
+            except Exception as e:
+                self._set_connection(False, f"Live stream error: {e}")
+            time.sleep(RECONNECT_SECONDS)
+
+    def _consume(self, lines):
+        event_type, data = None, []
+        for line in lines:
+            if line.startswith(":"):
+                continue  # keep-alive comment
+            if line.startswith("event:"):
+                event_type = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+            elif not line and data:
+                payload = json.loads("\n".join(data))
+                if event_type == "snapshot":
+                    self.apply_snapshot(payload)
+                elif event_type == "claims":
+                    self.apply_claims(payload)
+                event_type, data = None, []
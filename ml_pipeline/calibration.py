@@ -0,0 +1,196 @@
+"""
+Calibrate the risk normalization and High/Low Risk cutoff from stored scores.
+
+    python -m ml_pipeline.calibration --alert-rate 0.05 --min-precision 0.6
+
+Writes a new version of data/thresholds.json (previous versions are kept
+as thresholds.v<N>.json); the API loads it at startup.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+import numpy as np
+
+THRESHOLDS_PATH = "data/thresholds.json"
+DEFAULT_THRESHOLDS = {
+    "version": 0,
+    "high_risk_threshold": 0.5,
+    "risk_saturation_mse": 2.0,
+}
+# Raw scores above this quantile saturate at risk 1.0 (raised for small
+# alert budgets, see saturation_quantile)
+SATURATION_QUANTILE = 0.99
+DEFAULT_ALERT_RATE = 0.05
+# Fewer labelled claims than this and precision targets are ignored
+MIN_LABELS = 20
+REPORTED_QUANTILES = (0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+def load_thresholds(path=THRESHOLDS_PATH):
+    """
+    Current threshold config, or the built-in defaults if none was calibrated.
+    """
+    config = dict(DEFAULT_THRESHOLDS)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def load_scores(db_path):
+    """
+    All stored scores and labels as arrays (one query, no DataFrame).
+    Returns (risk_scores, anomaly_scores, labels); missing values are NaN.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(claims)")}
+        anomaly = "anomaly_score" if "anomaly_score" in columns else "NULL"
+        rows = conn.execute(
+            f"SELECT risk_score, {anomaly}, is_fraud FROM claims WHERE risk_score IS NOT NULL"
+        ).fetchall()
+    finally:
+        conn.close()
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def saturation_quantile(alert_rate):
+    """
+    Quantile of raw scores that maps to risk 1.0. It stays above the alert
+    cutoff (1 - alert_rate) so the claims around the cutoff still have
+    distinct risks instead of all tying at 1.0.
+    """
+    return max(SATURATION_QUANTILE, 1.0 - alert_rate / 2.0)
+
+def precision_recall_curve(scores, labels):
+    """
+    Precision and recall for every distinct cutoff "score >= t", computed
+    with one sort and two cumulative sums. Returns (thresholds, precision,
+    recall) ordered from the highest threshold down.
+    """
+    order = np.argsort(-scores, kind="mergesort")
+    scores, labels = scores[order], labels[order]
+    true_positives = np.cumsum(labels)
+    flagged = np.arange(1, len(scores) + 1)
+    # Keep the last index of each run of equal scores
+    distinct = np.r_[np.diff(scores) != 0, True]
+    thresholds = scores[distinct]
+    precision = true_positives[distinct] / flagged[distinct]
+    recall = true_positives[distinct] / max(true_positives[-1], 1)
+    return thresholds, precision, recall
+
+
+def calibrate(risk_scores, anomaly_scores, labels, alert_rate=DEFAULT_ALERT_RATE,
+              min_precision=None, current=None):
+    """
+    Build a new threshold config from stored scores.
+
+    The MSE saturation is set so that only raw scores above
+    saturation_quantile(alert_rate) saturate. The cutoff flags at most
+    `alert_rate` of claims and, when enough feedback labels exist and
+    `min_precision` is given, is raised if needed until labelled precision
+    reaches `min_precision`. Raises ValueError for a budget the stored
+    scores cannot meet (nothing would be flagged).
+    """
+    if not 0.0 < alert_rate < 1.0:
+        raise ValueError(f"Alert rate must be between 0 and 1, got {alert_rate}")
+    current = current or dict(DEFAULT_THRESHOLDS)
+    config = dict(current)
+
+    raw = anomaly_scores[~np.isnan(anomaly_scores)]
+    # Raw score 0 means the heuristic was used, so those are not MSEs
+    raw = raw[raw > 0]
+    if raw.size:
+        config["risk_saturation_mse"] = float(max(np.quantile(raw, saturation_quantile(alert_rate)), 1e-6))
+        has_raw = ~np.isnan(anomaly_scores) & (anomaly_scores > 0)
+        risk = np.where(has_raw, np.minimum(1.0, anomaly_scores / config["risk_saturation_mse"]), risk_scores)
+    else:
+        risk = risk_scores
+
+    if risk.size == 0:
+        raise ValueError("No scored claims to calibrate from")
+
+    # Alert budget: at most alert_rate of claims strictly above the cutoff
+    threshold = float(np.quantile(risk, 1.0 - alert_rate))
+    if not np.any(risk > threshold):
+        raise ValueError(
+            f"Alert rate {alert_rate} cannot be met: the top {alert_rate:.2%} of {risk.size} claims "
+            f"all have risk {threshold:.4f}, so no cutoff flags them"
+        )
+
+    labelled = ~np.isnan(labels)
+    pr = None
+    if labelled.sum() >= MIN_LABELS:
+        thresholds, precision, recall = precision_recall_curve(risk[labelled], labels[labelled])
+        if min_precision is not None:
+            # Lowest cutoff inside the budget whose precision meets the target
+            ok = (precision >= min_precision) & (thresholds > threshold)
+            if ok.any():
+                # Just below the chosen score, so "risk > threshold" includes it
+                threshold = float(np.nextafter(thresholds[ok].min(), 0.0))
+        # Smallest curve cutoff above the threshold = the set flagged by "risk > threshold"
+        at = np.searchsorted(-thresholds, -threshold, side="left") - 1
+        pr = {
+            "labels": int(labelled.sum()),
+            "precision": float(precision[at]) if at >= 0 else None,
+            "recall": float(recall[at]) if at >= 0 else 0.0,
+        }
+
+    config.update({
+        "version": int(current.get("version", 0)) + 1,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "high_risk_threshold": threshold,
+        "alert_rate": alert_rate,
+        "min_precision": min_precision,
+        "claims": int(risk.size),
+        "expected_alert_rate": float(np.mean(risk > threshold)),
+        "quantiles": {str(q): float(v) for q, v in zip(REPORTED_QUANTILES, np.quantile(risk, REPORTED_QUANTILES))},
+        "feedback": pr,
+    })
+    return config
+
+
+def save_thresholds(config, path=THRESHOLDS_PATH):
+    """
+    Write the config, keeping the previous version alongside it.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path):
+        previous = load_thresholds(path)
+        root, ext = os.path.splitext(path)
+        shutil.copyfile(path, f"{root}.v{previous['version']}{ext}")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate risk thresholds from stored scores and feedback.")
+    parser.add_argument("--db", default=os.environ.get("DATABASE_PATH", "data/claims.db"))
+    parser.add_argument("--output", default=THRESHOLDS_PATH)
+    parser.add_argument("--alert-rate", type=float, default=DEFAULT_ALERT_RATE,
+                        help="Maximum share of claims flagged High Risk")
+    parser.add_argument("--min-precision", type=float, default=None,
+                        help="Raise the cutoff until labelled precision reaches this")
+    args = parser.parse_args()
+
+    risk_scores, anomaly_scores, labels = load_scores(args.db)
+    try:
+        config = calibrate(risk_scores, anomaly_scores, labels, args.alert_rate, args.min_precision,
+                           current=load_thresholds(args.output))
+    except ValueError as e:
+        parser.error(str(e))
+    save_thresholds(config, args.output)
+    print(json.dumps(config, indent=2))
+    print(f"Threshold config v{config['version']} saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
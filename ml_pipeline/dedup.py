@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+import numpy as np
+from ml_pipeline.features import clean_text
+
+# MinHash / LSH configuration. 16 bands of 8 rows puts the LSH
+# S-curve midpoint near Jaccard 0.7, which is what "lightly edited copy"
+# looks like on word 3-gram shingles.
+NUM_PERM = 128
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.7
+# Upper bound on candidates verified per query, so hot buckets stay cheap
+MAX_CANDIDATES = 1000
+_MERSENNE_PRIME = (1 << 61) - 1
+_SEED = 1
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """
+    Hash the word k-grams of cleaned claim text to 32-bit integers.
+    """
+    words = clean_text(text).split()
+    if len(words) < k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.array(sorted({zlib.crc32(g.encode("utf-8")) for g in grams}), dtype=np.uint64)
+
+
+class MinHasher:
+    """
+    Vectorized MinHash over NUM_PERM universal hash functions.
+    The permutations are seeded so signatures stay comparable across runs.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=_SEED):
+        rng = np.random.RandomState(seed)
+        # Keep a, b below 2**31 so a * x + b fits in uint64 for 32-bit x
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text):
+        hashes = shingles(text)
+        if hashes.size == 0:
+            return None
+        permuted = (np.outer(hashes, self.a) + self.b) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class MinHashLSHIndex:
+    """
+    Persistent LSH index of claim MinHash signatures, stored in its own
+    SQLite file. Each band of a signature is hashed to a bucket; a query
+    looks up LSH_BANDS buckets by index and verifies only those candidates,
+    so query cost does not grow with the number of stored claims.
+    """
+
+    def __init__(self, path, num_perm=NUM_PERM, bands=LSH_BANDS, threshold=SIMILARITY_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            # The index is derived data, so it trades fsyncs for speed
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS lsh_signatures (claim_id INTEGER PRIMARY KEY, signature BLOB)")
+            conn.execute("CREATE TABLE IF NOT EXISTS lsh_buckets (band INTEGER, bucket INTEGER, claim_id INTEGER)")
+            has_unique = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_lsh_buckets_claim'"
+            ).fetchone()
+            if not has_unique:
+                # Indexes built before bucket rows were unique may hold repeats
+                conn.execute(
+                    "DELETE FROM lsh_buckets WHERE rowid NOT IN "
+                    "(SELECT MIN(rowid) FROM lsh_buckets GROUP BY band, bucket, claim_id)"
+                )
+                conn.execute("DROP INDEX IF EXISTS idx_lsh_buckets")
+                # One row per (band, bucket, claim); also serves newest-first bucket scans
+                conn.execute(
+                    "CREATE UNIQUE INDEX idx_lsh_buckets_claim ON lsh_buckets (band, bucket, claim_id)"
+                )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8).digest()
+            yield band, int.from_bytes(digest, "little", signed=True)
+
+    def query(self, signature):
+        """
+        Return [(claim_id, estimated_jaccard)] for stored claims at or
+        above the similarity threshold, most similar first.
+        """
+        if signature is None:
+            return []
+        with self._lock:
+            conn = self._connection()
+            candidates = set()
+            for band, bucket in self._band_keys(signature):
+                rows = conn.execute(
+                    # Newest first, so busy buckets (shared form templates)
+                    # still surface recent resubmissions
+                    "SELECT claim_id FROM lsh_buckets WHERE band = ? AND bucket = ? ORDER BY claim_id DESC LIMIT ?",
+                    (band, bucket, MAX_CANDIDATES),
+                )
+                candidates.update(row[0] for row in rows)
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+            if not candidates:
+                return []
+            ids = sorted(candidates, reverse=True)[:MAX_CANDIDATES]
+            placeholders = ",".join("?" * len(ids))
+            stored = conn.execute(
+                f"SELECT claim_id, signature FROM lsh_signatures WHERE claim_id IN ({placeholders})", ids
+            ).fetchall()
+
+        matches = []
+        for claim_id, blob in stored:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= self.threshold:
+                matches.append((claim_id, similarity))
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def insert(self, claim_id, signature):
+        if signature is None:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO lsh_signatures (claim_id, signature) VALUES (?, ?)",
+                (claim_id, signature.tobytes()),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (band, bucket, claim_id) VALUES (?, ?, ?)",
+                [(band, bucket, claim_id) for band, bucket in self._band_keys(signature)],
+            )
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
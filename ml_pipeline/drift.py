@@ -0,0 +1,122 @@
+import math
+import threading
+from bisect import bisect_right
+from statistics import NormalDist
+
+# Equal-probability bins under the training reference distribution
+DRIFT_BINS = 10
+# PSI above 0.2 is the usual "significant shift" rule of thumb
+PSI_ALERT_THRESHOLD = 0.2
+# Below this many observations drift figures are too noisy to act on
+MIN_DRIFT_SAMPLES = 100
+# Coefficient of the two-sample KS critical value at alpha = 0.05
+KS_ALPHA_COEFFICIENT = 1.36
+_EPSILON = 1e-6
+
+
+class FeatureDriftTracker:
+    """
+    Streaming histogram and moments for one model input, compared with
+    a normal reference N(mean, std) taken from the training scaler.
+
+    Bin edges are reference quantiles, so every bin expects the same
+    share of traffic and update() is a bisect over DRIFT_BINS edges
+    plus a Welford step.
+    """
+
+    def __init__(self, reference_mean, reference_std, bins=DRIFT_BINS):
+        self.reference = NormalDist(reference_mean, max(reference_std, _EPSILON))
+        self.edges = [self.reference.inv_cdf(i / bins) for i in range(1, bins)]
+        self.counts = [0] * bins
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def psi(self):
+        if self.n == 0:
+            return 0.0
+        expected = 1.0 / len(self.counts)
+        total = 0.0
+        for count in self.counts:
+            actual = max(count / self.n, _EPSILON)
+            total += (actual - expected) * math.log(actual / expected)
+        return total
+
+    def ks(self):
+        """
+        KS statistic evaluated at the bin edges (reference CDF there is i/bins).
+        """
+        if self.n == 0:
+            return 0.0
+        bins = len(self.counts)
+        cumulative = 0
+        worst = 0.0
+        for i, count in enumerate(self.counts[:-1], start=1):
+            cumulative += count
+            worst = max(worst, abs(cumulative / self.n - i / bins))
+        return worst
+
+    def report(self):
+        psi = self.psi()
+        ks = self.ks()
+        ks_critical = KS_ALPHA_COEFFICIENT / math.sqrt(self.n) if self.n else 1.0
+        enough = self.n >= MIN_DRIFT_SAMPLES
+        return {
+            "count": self.n,
+            "mean": self.mean,
+            "std": self.std,
+            "reference_mean": self.reference.mean,
+            "reference_std": self.reference.stdev,
+            "psi": psi,
+            "ks": ks,
+            "ks_critical": ks_critical,
+            "histogram": list(self.counts),
+            "drifted": enough and (psi > PSI_ALERT_THRESHOLD or ks > ks_critical),
+        }
+
+
+class DriftMonitor:
+    """
+    Online drift monitor over all model inputs.
+    """
+
+    def __init__(self, feature_names, means, stds, bins=DRIFT_BINS):
+        self.feature_names = tuple(feature_names)
+        self.trackers = {
+            name: FeatureDriftTracker(mean, std, bins)
+            for name, mean, std in zip(self.feature_names, means, stds)
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_scaler(cls, scaler, feature_names, bins=DRIFT_BINS):
+        """
+        Use the StandardScaler fitted in train.py as the reference.
+        """
+        return cls(feature_names, scaler.mean_, scaler.scale_, bins)
+
+    def update(self, features):
+        with self._lock:
+            for name in self.feature_names:
+                value = features.get(name)
+                if value is not None:
+                    self.trackers[name].update(float(value))
+
+    def report(self):
+        with self._lock:
+            per_feature = {name: tracker.report() for name, tracker in self.trackers.items()}
+        return {
+            "features": per_feature,
+            "retrain_recommended": any(r["drifted"] for r in per_feature.values()),
+        }
@@ -0,0 +1,87 @@
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+
+# Ordered autoencoder inputs; train.py and predict.py both build matrices from this
+MODEL_FEATURES = ("cost", "doctor_frequency", "diagnosis_frequency", "cost_outlier_score")
+# Inputs of model artifacts saved before the schema was stored with them
+LEGACY_FEATURES = ("cost", "doctor_frequency")
+# Everything compute_features produces, i.e. what a saved schema may ask for
+AVAILABLE_FEATURES = (
+    "cost", "doctor_frequency", "diagnosis_frequency", "pair_frequency",
+    "doctor_diagnosis_share", "pair_rarity", "cost_outlier_score",
+    "diagnosis_cost_percentile", "doctor_cost_percentile", "near_duplicate_count",
+)
+DTYPE = np.float32
+
+
+class FeatureSchemaError(ValueError):
+    """
+    A model artifact's inputs do not match what the pipeline can provide.
+    """
+
+
+class FeatureSchema:
+    """
+    Ordered list of model inputs and the matrix builder for it.
+
+    Rows are pulled out of the feature dicts with one C-level itemgetter
+    call per claim and written straight into a contiguous float32 array,
+    so there is no per-field lookup loop in Python.
+    """
+
+    def __init__(self, names=MODEL_FEATURES):
+        self.names = tuple(names)
+        if not self.names:
+            raise FeatureSchemaError("Feature schema is empty")
+        unknown = [name for name in self.names if name not in AVAILABLE_FEATURES]
+        if unknown:
+            raise FeatureSchemaError(f"Unknown model features: {', '.join(unknown)}")
+        # Always return a tuple, even for a single feature
+        getter = itemgetter(*self.names)
+        self._getter = getter if len(self.names) > 1 else lambda features: (getter(features),)
+
+    @property
+    def dim(self):
+        return len(self.names)
+
+    def _row(self, features):
+        try:
+            return self._getter(features)
+        except KeyError:
+            # A silent 0 would be scored as a real value; make the caller fix it
+            missing = [name for name in self.names if name not in features]
+            raise FeatureSchemaError(f"Missing model features: {', '.join(missing)}") from None
+
+    def matrix(self, features_batch):
+        """
+        (n_claims, dim) C-contiguous float32 matrix for a list of feature dicts.
+        """
+        count = len(features_batch)
+        values = chain.from_iterable(map(self._row, features_batch))
+        return np.fromiter(values, dtype=DTYPE, count=count * self.dim).reshape(count, self.dim)
+
+    def vector(self, features):
+        """
+        (1, dim) matrix for a single claim.
+        """
+        return self.matrix([features])
+
+    def to_dict(self):
+        return {"features": list(self.names), "dtype": np.dtype(DTYPE).name}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["features"])
+
+    def check_dim(self, dim, what):
+        if dim != self.dim:
+            raise FeatureSchemaError(
+                f"{what} expects {dim} inputs but the feature schema has {self.dim}: {', '.join(self.names)}"
+            )
+
+    def __eq__(self, other):
+        return isinstance(other, FeatureSchema) and self.names == other.names
+
+    def __repr__(self):
+        return f"FeatureSchema({self.names!r})"
@@ -1,8 +1,10 @@
+import os
 import re
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import numpy as np
+from ml_pipeline.sketches import PEER_GROUPS
 
 def clean_text(text):
     """
@@ -80,51 +82,117 @@ def extract_entities(text):
 
     return entities
 
-def compute_features(entities, historical_data=None):
+# Most recent costs the cost outlier model is fitted on, by the API and the
+# backfill alike, so both score claims with the same model
+COST_OUTLIER_FIT_SAMPLE = int(os.environ.get("COST_OUTLIER_FIT_SAMPLE", 20000))
+
+class CostOutlierModel:
+    """
+    IsolationForest over standardized historical costs, fitted once and
+    reused for many claims instead of refitting per claim.
+    """
+
+    def __init__(self, costs):
+        costs = np.asarray(costs, dtype=float).reshape(-1, 1)
+        self.scaler = None
+        self.iso_forest = None
+        if len(costs) > 0:
+            self.scaler = StandardScaler()
+            scaled_costs = self.scaler.fit_transform(costs)
+            self.iso_forest = IsolationForest(contamination=0.1, random_state=42)
+            self.iso_forest.fit(scaled_costs)
+
+    def score_many(self, costs):
+        costs = np.asarray(costs, dtype=float).reshape(-1, 1)
+        if self.iso_forest is None:
+            return np.zeros(len(costs))
+        return self.iso_forest.decision_function(self.scaler.transform(costs))
+
+    def score(self, cost):
+        return float(self.score_many([cost])[0])
+
+def compute_features(entities, historical_data=None, peer_index=None, near_duplicate_ids=None, graph=None,
+                     cost_outlier_model=None):
     """
     Compute features: frequency, outliers, etc.
     If historical_data is provided, compute relative features.
+    If peer_index (a PeerCostIndex) is provided, compute the claim's cost
+    percentile within its diagnosis and doctor peer groups.
+    near_duplicate_ids are stored claims whose text nearly matches this one.
+    If graph (a CooccurrenceGraph) is provided, frequency and doctor-diagnosis
+    pair features are read from it instead of counting historical_data.
+    A prefitted cost_outlier_model takes the place of fitting one on
+    historical_data costs.
     """
     features = {}
 
     # Basic features from entities
     features['cost'] = entities.get('cost', 0)
 
-    # Frequency features (if historical data available)
-    if historical_data is not None:
+    # Frequency features
+    if graph is not None:
+        features.update(graph.features(entities.get('doctor'), entities.get('diagnosis')))
+    elif historical_data is not None:
         # Frequency of doctor
         doctor_freq = historical_data['doctor'].value_counts().get(entities.get('doctor'), 0)
-        features['doctor_frequency'] = doctor_freq
+        features['doctor_frequency'] = int(doctor_freq)
 
         # Frequency of diagnosis
         diagnosis_freq = historical_data['diagnosis'].value_counts().get(entities.get('diagnosis'), 0)
-        features['diagnosis_frequency'] = diagnosis_freq
-
-        # Outlier detection on cost
-        costs = historical_data['cost'].dropna()
-        if len(costs) > 0:
-            scaler = StandardScaler()
-            scaled_costs = scaler.fit_transform(costs.values.reshape(-1, 1))
-            iso_forest = IsolationForest(contamination=0.1, random_state=42)
-            iso_forest.fit(scaled_costs)
-            scaled_cost = scaler.transform([[features['cost']]])
-            features['cost_outlier_score'] = iso_forest.decision_function(scaled_cost)[0]
-        else:
-            features['cost_outlier_score'] = 0
+        features['diagnosis_frequency'] = int(diagnosis_freq)
     else:
         features['doctor_frequency'] = 0
         features['diagnosis_frequency'] = 0
+    features.setdefault('pair_frequency', 0)
+    features.setdefault('doctor_diagnosis_share', 0.0)
+    features.setdefault('pair_rarity', 0.0)
+
+    # Outlier detection on cost (if historical data available)
+    if cost_outlier_model is None and historical_data is not None:
+        cost_outlier_model = CostOutlierModel(historical_data['cost'].dropna().values)
+    if cost_outlier_model is not None and cost_outlier_model.iso_forest is not None and features['cost'] is not None:
+        features['cost_outlier_score'] = cost_outlier_model.score(features['cost'])
+    else:
         features['cost_outlier_score'] = 0
 
+    # Peer-group cost percentiles (0.5 = neutral when the group has no history)
+    for group in PEER_GROUPS:
+        percentile = None
+        if peer_index is not None:
+            percentile = peer_index.percentile(group, entities.get(group), entities.get('cost'))
+        features[f'{group}_cost_percentile'] = percentile if percentile is not None else 0.5
+
+    # Lightly edited resubmissions of earlier claims
+    features['near_duplicate_count'] = len(near_duplicate_ids) if near_duplicate_ids else 0
+
     return features
 
-def preprocess_claim(text, historical_data=None):
+def compute_features_batch(entities_list, cost_outlier_model=None, near_duplicate_ids_list=None, **history):
+    """
+    compute_features for many claims, scoring cost outliers for the whole
+    batch in one vectorized call instead of once per claim.
+    history: peer_index / graph, passed through to compute_features.
+    """
+    near_duplicate_ids_list = near_duplicate_ids_list or [None] * len(entities_list)
+    features_list = [
+        compute_features(entities, near_duplicate_ids=near_duplicate_ids, **history)
+        for entities, near_duplicate_ids in zip(entities_list, near_duplicate_ids_list)
+    ]
+    if cost_outlier_model is not None and cost_outlier_model.iso_forest is not None:
+        known = [i for i, features in enumerate(features_list) if features['cost'] is not None]
+        if known:
+            scores = cost_outlier_model.score_many([features_list[i]['cost'] for i in known])
+            for i, score in zip(known, scores.tolist()):
+                features_list[i]['cost_outlier_score'] = score
+    return features_list
+
+def preprocess_claim(text, historical_data=None, peer_index=None, near_duplicate_ids=None, graph=None):
     """
     Full preprocessing pipeline: clean, extract, compute features.
     """
     cleaned_text = clean_text(text)
     entities = extract_entities(cleaned_text)
-    features = compute_features(entities, historical_data)
+    features = compute_features(entities, historical_data, peer_index, near_duplicate_ids, graph)
     return entities, features
 
 if __name__ == "__main__":
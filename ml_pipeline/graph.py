@@ -0,0 +1,71 @@
+import math
+import threading
+from collections import Counter, defaultdict
+
+
+class CooccurrenceGraph:
+    """
+    Bipartite doctor <-> diagnosis graph of claim counts.
+
+    Edges are kept as sparse per-doctor counters plus marginal totals, so
+    an insert and every feature lookup are a handful of dict operations.
+    Loads from (doctor, diagnosis, count) rows, e.g. a GROUP BY cursor,
+    without building a DataFrame.
+    """
+
+    def __init__(self):
+        self.pairs = defaultdict(Counter)
+        self.doctor_totals = Counter()
+        self.diagnosis_totals = Counter()
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def update(self, doctor, diagnosis, count=1):
+        with self._lock:
+            self.total += count
+            if doctor:
+                self.doctor_totals[doctor] += count
+            if diagnosis:
+                self.diagnosis_totals[diagnosis] += count
+            if doctor and diagnosis:
+                self.pairs[doctor][diagnosis] += count
+
+    def add_claim(self, entities):
+        self.update(entities.get('doctor'), entities.get('diagnosis'))
+
+    def load(self, rows):
+        """
+        Bulk-load from an iterable of (doctor, diagnosis, count) rows.
+        """
+        for doctor, diagnosis, count in rows:
+            self.update(doctor, diagnosis, count)
+
+    def pair_count(self, doctor, diagnosis):
+        edges = self.pairs.get(doctor)
+        return edges.get(diagnosis, 0) if edges else 0
+
+    def features(self, doctor, diagnosis, exclude_self=False):
+        """
+        Marginal and pair features for one claim (counts exclude the claim itself).
+
+        doctor_diagnosis_share: share of this doctor's claims with this diagnosis.
+        pair_rarity: log((expected + 1) / (observed + 1)) where expected is
+        the pair count if doctors and diagnoses were independent; positive
+        when the pair is rarer than the marginals predict.
+        exclude_self: the claim is already in the graph (rescoring stored
+        claims), so take its own contribution out of every count.
+        """
+        own = 1 if exclude_self else 0
+        with self._lock:
+            doctor_total = self.doctor_totals.get(doctor, 0) - own if doctor else 0
+            diagnosis_total = self.diagnosis_totals.get(diagnosis, 0) - own if diagnosis else 0
+            pair = self.pair_count(doctor, diagnosis) - own if doctor and diagnosis else 0
+            total = self.total - own
+        expected = doctor_total * diagnosis_total / total if total else 0.0
+        return {
+            'doctor_frequency': doctor_total,
+            'diagnosis_frequency': diagnosis_total,
+            'pair_frequency': pair,
+            'doctor_diagnosis_share': pair / doctor_total if doctor_total else 0.0,
+            'pair_rarity': math.log((expected + 1.0) / (pair + 1.0)),
+        }
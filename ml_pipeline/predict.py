@@ -3,49 +3,181 @@ import joblib
 import numpy as np
 import os
 from ml_pipeline.models.autoencoder import Autoencoder
+from ml_pipeline.calibration import load_thresholds
+from ml_pipeline.feature_registry import FeatureSchema, LEGACY_FEATURES
 
 MODEL_PATH = "data/autoencoder.pth"
 SCALER_PATH = "data/scaler.pkl"
-INPUT_DIM = 2
+SHAP_BACKGROUND_SIZE = 50
+SHAP_NSAMPLES = 100
+# Risk normalization and High/Low cutoff (see ml_pipeline/calibration.py)
+thresholds = load_thresholds()
+
+def risk_from_anomaly(raw_anomaly_score, cost_outlier_score=0.0):
+    """
+    Map the raw reconstruction error to a 0-1 risk score.
+    A raw score of 0 means no model is loaded, so the cost outlier
+    heuristic is used instead. Accepts scalars or NumPy arrays.
+    """
+    raw = np.asarray(raw_anomaly_score, dtype=float)
+    heuristic = np.clip((np.asarray(cost_outlier_score, dtype=float) + 1) / 2, 0.0, 1.0)
+    risk = np.where(raw == 0, heuristic, np.minimum(1.0, raw / thresholds["risk_saturation_mse"]))
+    return float(risk) if risk.ndim == 0 else risk
+
+def risk_label(risk_score):
+    """
+    High/Low Risk label for a risk score (scalar or NumPy array).
+    """
+    cutoff = thresholds["high_risk_threshold"]
+    if np.ndim(risk_score) == 0:
+        return "High Risk" if risk_score > cutoff else "Low Risk"
+    return np.where(np.asarray(risk_score) > cutoff, "High Risk", "Low Risk")
+
+def load_checkpoint(path=MODEL_PATH):
+    """
+    Read a model artifact as (state_dict, FeatureSchema). Artifacts saved
+    before the schema was stored with the weights are plain state dicts
+    and get the legacy (cost, doctor_frequency) schema.
+    """
+    checkpoint = torch.load(path)
+    if "state_dict" in checkpoint:
+        return checkpoint["state_dict"], FeatureSchema.from_dict(checkpoint["feature_schema"])
+    return checkpoint, FeatureSchema(LEGACY_FEATURES)
 
 class AnomalyDetector:
     def __init__(self):
         self.model = None
         self.scaler = None
+        self.schema = None
+        self._shap_explainer = None
         self.load_model()
 
+    @property
+    def feature_names(self):
+        return self.schema.names if self.schema is not None else ()
+
     def load_model(self):
+        """
+        Load the autoencoder, scaler and the feature schema they were trained
+        on. Raises FeatureSchemaError if the three disagree.
+        """
         if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
-            self.model = Autoencoder(INPUT_DIM)
-            self.model.load_state_dict(torch.load(MODEL_PATH))
-            self.model.eval()
-            self.scaler = joblib.load(SCALER_PATH)
+            state_dict, schema = load_checkpoint(MODEL_PATH)
+            scaler = joblib.load(SCALER_PATH)
+            schema.check_dim(scaler.n_features_in_, SCALER_PATH)
+            schema.check_dim(state_dict["encoder.0.weight"].shape[1], MODEL_PATH)
+            model = Autoencoder(schema.dim)
+            model.load_state_dict(state_dict)
+            model.eval()
+            self.model, self.scaler, self.schema = model, scaler, schema
+            self._shap_explainer = None
         else:
             print("Model not found, using heuristics.")
-    
-    def predict(self, features):
+
+    def _reconstruction_errors(self, input_data):
         """
-        Predict anomaly score. High score = Anomaly.
-        features: dict with 'cost' and 'doctor_frequency'
+        (n_claims, dim) squared reconstruction errors in scaled space for a
+        raw input matrix: one scaler transform and one forward pass.
         """
-        if not self.model or not self.scaler:
-            return 0.0 # Fallback
-            
-        # Prepare input
-        # Assuming features are provided
-        input_data = np.array([[features.get('cost', 0), features.get('doctor_frequency', 0)]])
-        
+        if len(input_data) == 0:
+            # The scaler rejects empty input (e.g. a batch with no complete claims)
+            return torch.zeros((0, self.schema.dim))
+
         # Scale
         scaled_data = self.scaler.transform(input_data)
-        tensor_data = torch.FloatTensor(scaled_data)
-        
+        tensor_data = torch.from_numpy(np.ascontiguousarray(scaled_data, dtype=np.float32))
+
         # Reconstruct
         with torch.no_grad():
             reconstructed = self.model(tensor_data)
-            
+
+        return (tensor_data - reconstructed) ** 2
+
+    def _reconstruction_error(self, features):
+        """
+        Per-dimension squared reconstruction error for one claim, in scaled space.
+        """
+        return self._reconstruction_errors(self.schema.vector(features))[0]
+
+    def predict(self, features):
+        """
+        Predict anomaly score. High score = Anomaly.
+        features: dict from compute_features (the schema's inputs are used)
+        """
+        if not self.model or not self.scaler:
+            return 0.0 # Fallback
+
         # Compute MSE loss as anomaly score
-        loss = torch.mean((tensor_data - reconstructed) ** 2).item()
+        loss = torch.mean(self._reconstruction_error(features)).item()
         return loss
 
+    def predict_batch(self, features_batch):
+        """
+        Anomaly scores for many claims at once (NumPy array, one per claim).
+        """
+        if not self.model or not self.scaler:
+            return np.zeros(len(features_batch))
+
+        return self.score_matrix(self.schema.matrix(features_batch))
+
+    def explain(self, features):
+        """
+        Predict anomaly score and split it into per-feature contributions.
+        Each contribution is that input's squared reconstruction error divided
+        by the number of inputs, so the contributions sum exactly to the score returned
+        by predict(). Costs one forward pass, same as predict().
+        Returns (score, contributions), or (0.0, None) without a model.
+        """
+        if not self.model or not self.scaler:
+            return 0.0, None
+
+        scores, contributions = self.explain_batch([features])
+        return float(scores[0]), contributions[0]
+
+    def explain_batch(self, features_batch):
+        """
+        explain() for many claims with one forward pass for the whole batch.
+        Returns (scores, contributions): a NumPy array and one dict per claim,
+        or zeros and Nones without a model.
+        """
+        if not self.model or not self.scaler:
+            return np.zeros(len(features_batch)), [None for _ in features_batch]
+
+        errors = (self._reconstruction_errors(self.schema.matrix(features_batch)) / self.schema.dim).numpy()
+        contributions = [dict(zip(self.schema.names, row)) for row in errors.tolist()]
+        return errors.sum(axis=1, dtype=np.float64), contributions
+
+    def score_matrix(self, input_data):
+        """
+        Anomaly scores for a raw (unscaled) input matrix, one row per claim.
+        Vectorized: one scaler transform and one forward pass per batch.
+        """
+        return torch.mean(self._reconstruction_errors(input_data), dim=1).numpy()
+
+    def _get_shap_explainer(self):
+        # Background is drawn once from the training distribution recorded in
+        # the scaler and reused for every request.
+        if self._shap_explainer is None:
+            import shap
+            rng = np.random.default_rng(42)
+            background = rng.normal(
+                self.scaler.mean_, self.scaler.scale_, size=(SHAP_BACKGROUND_SIZE, self.schema.dim)
+            )
+            self._shap_explainer = shap.KernelExplainer(self.score_matrix, background)
+        return self._shap_explainer
+
+    def explain_shap(self, features_batch, nsamples=SHAP_NSAMPLES):
+        """
+        KernelSHAP attributions for a batch of claims against a cached
+        background. Much slower than explain(); meant for offline or
+        batched use. Returns one {feature: shap_value} dict per claim.
+        """
+        if not self.model or not self.scaler:
+            return [None for _ in features_batch]
+
+        input_data = self.schema.matrix(features_batch)
+        values = self._get_shap_explainer().shap_values(input_data, nsamples=nsamples, silent=True)
+        return [dict(zip(self.schema.names, row.tolist())) for row in np.atleast_2d(values)]
+
 # Singleton instance
 detector = AnomalyDetector()
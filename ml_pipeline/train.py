@@ -6,36 +6,51 @@ import os
 import joblib
 from sklearn.preprocessing import StandardScaler
 from ml_pipeline.models.autoencoder import Autoencoder
+from ml_pipeline.feature_registry import FeatureSchema
+from ml_pipeline.features import CostOutlierModel
 
 # Configuration
 MODEL_PATH = "data/autoencoder.pth"
 SCALER_PATH = "data/scaler.pkl"
-INPUT_DIM = 2 # Using Cost and Doctor Frequency for this simple MVP
 
 def generate_mock_data(n_samples=1000):
     """
-    Generate normal claim data for training (learning 'normal' behavior).
+    Generate normal claims for training (learning 'normal' behavior), as
+    feature dicts in the same shape compute_features returns.
     """
-    # Normal claims: Cost around $100-$500, Freq around 5-20
+    # Normal claims: Cost around $100-$500, doctor freq around 5-20,
+    # diagnoses shared across doctors so seen more often
     costs = np.random.normal(300, 100, n_samples)
-    freqs = np.random.normal(10, 5, n_samples)
-    
-    data = np.stack([costs, freqs], axis=1)
-    return data
+    doctor_freqs = np.random.normal(10, 5, n_samples)
+    diagnosis_freqs = np.random.normal(25, 8, n_samples)
+    # Same cost outlier model the API fits on recent costs
+    outlier_scores = CostOutlierModel(costs).score_many(costs)
+
+    return [
+        {
+            'cost': cost,
+            'doctor_frequency': doctor_freq,
+            'diagnosis_frequency': diagnosis_freq,
+            'cost_outlier_score': outlier_score,
+        }
+        for cost, doctor_freq, diagnosis_freq, outlier_score
+        in zip(costs, doctor_freqs, diagnosis_freqs, outlier_scores)
+    ]
 
-def train_model():
-    print("Generating mock training data...")
-    data = generate_mock_data()
+def train_model(schema=None):
+    schema = schema or FeatureSchema()
+    print(f"Generating mock training data for inputs: {', '.join(schema.names)}")
+    data = schema.matrix(generate_mock_data())
     
     # Normalize
     scaler = StandardScaler()
     data_scaled = scaler.fit_transform(data)
     
     # Convert to Tensor
-    tensor_data = torch.FloatTensor(data_scaled)
+    tensor_data = torch.from_numpy(np.ascontiguousarray(data_scaled, dtype=np.float32))
     
     # Initialize Model
-    model = Autoencoder(INPUT_DIM)
+    model = Autoencoder(schema.dim)
     criterion = nn.MSELoss()
     optimizer = optim.Adam(model.parameters(), lr=0.001)
     
@@ -53,7 +68,8 @@ def train_model():
             
     # Save Model and Scaler
     os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-    torch.save(model.state_dict(), MODEL_PATH)
+    # The schema travels with the weights so serving can reject mismatched inputs
+    torch.save({"state_dict": model.state_dict(), "feature_schema": schema.to_dict()}, MODEL_PATH)
     joblib.dump(scaler, SCALER_PATH)
     print(f"Model saved to {MODEL_PATH}")
     print(f"Scaler saved to {SCALER_PATH}")
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Keep test writes out of the tracked data/claims.db. Must be set before
+# backend.app is imported, since the repository reads it at import time.
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="claims-test-"), "claims.db"))
@@ -0,0 +1,84 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from backend.app.backfill import run_backfill
+from backend.app.repository import create_schema
+from ml_pipeline.features import CostOutlierModel
+from ml_pipeline.feature_registry import FeatureSchema, FeatureSchemaError
+from ml_pipeline.predict import detector, risk_from_anomaly
+
+
+@pytest.fixture
+def claims_db(tmp_path):
+    path = str(tmp_path / "claims.db")
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    rng = np.random.default_rng(0)
+    conn.executemany(
+        "INSERT INTO claims (doctor, diagnosis, cost, risk_score, prediction) VALUES (?, ?, ?, 1.0, 'High Risk')",
+        [(f"doc{i % 7}", f"diag{i % 3}", float(rng.normal(300, 100))) for i in range(250)],
+    )
+    conn.execute("INSERT INTO claims (doctor, risk_score, prediction) VALUES ('x', 1.0, 'High Risk')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_backfill_rescores_all_claims(claims_db):
+    summary = run_backfill(claims_db, chunk_size=100, log=lambda *_: None)
+
+    assert summary["rows"] == 250
+    conn = sqlite3.connect(claims_db)
+    doctor, diagnosis, cost, risk, anomaly = conn.execute(
+        "SELECT doctor, diagnosis, cost, risk_score, anomaly_score FROM claims WHERE id = 1"
+    ).fetchone()
+    # Same counts an identical new claim would see: every stored claim but itself
+    features = {
+        "cost": cost,
+        "doctor_frequency": conn.execute("SELECT COUNT(*) FROM claims WHERE doctor = ? AND id != 1", (doctor,)).fetchone()[0],
+        "diagnosis_frequency": conn.execute(
+            "SELECT COUNT(*) FROM claims WHERE diagnosis = ? AND id != 1", (diagnosis,)
+        ).fetchone()[0],
+        "cost_outlier_score": CostOutlierModel([row[0] for row in conn.execute(
+            "SELECT cost FROM claims WHERE cost IS NOT NULL ORDER BY id DESC"
+        )]).score(cost),
+    }
+    # Claims without a cost are left alone
+    assert conn.execute("SELECT anomaly_score FROM claims WHERE cost IS NULL").fetchone()[0] is None
+    conn.close()
+
+    if detector.model is not None:
+        expected = detector.predict(features)
+        assert anomaly == pytest.approx(expected, rel=1e-4)
+        assert risk == pytest.approx(risk_from_anomaly(expected), rel=1e-4)
+
+
+def test_backfill_resumes_from_checkpoint(claims_db):
+    class Interrupt(Exception):
+        pass
+
+    def stop_after_first_chunk(message):
+        if "rows rescored" in message:
+            raise Interrupt()
+
+    with pytest.raises(Interrupt):
+        run_backfill(claims_db, chunk_size=100, job="test", log=stop_after_first_chunk)
+
+    summary = run_backfill(claims_db, chunk_size=100, job="test", log=lambda *_: None)
+    assert summary["rows"] == 150
+
+    again = run_backfill(claims_db, chunk_size=100, job="test", log=lambda *_: None)
+    assert again["rows"] == 0
+
+
+def test_backfill_rejects_inputs_it_cannot_recompute(claims_db, monkeypatch):
+    monkeypatch.setattr(detector, "schema", FeatureSchema(("cost", "near_duplicate_count")))
+
+    with pytest.raises(FeatureSchemaError, match="near_duplicate_count"):
+        run_backfill(claims_db, log=lambda *_: None)
+
+    conn = sqlite3.connect(claims_db)
+    assert conn.execute("SELECT COUNT(*) FROM claims WHERE risk_score != 1.0").fetchone()[0] == 0
+    conn.close()
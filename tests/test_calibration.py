@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from ml_pipeline.calibration import calibrate, load_thresholds, precision_recall_curve, save_thresholds
+
+
+def test_precision_recall_matches_brute_force():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 20, size=300) / 20.0
+    labels = (rng.random(300) < scores).astype(float)
+
+    thresholds, precision, recall = precision_recall_curve(scores, labels)
+
+    for t, p, r in zip(thresholds, precision, recall):
+        flagged = scores >= t
+        assert p == (labels[flagged].sum() / flagged.sum())
+        assert r == (labels[flagged].sum() / labels.sum())
+
+
+def test_threshold_respects_alert_budget():
+    rng = np.random.default_rng(1)
+    anomaly = rng.gamma(2.0, 0.3, size=10000)
+    risk = np.minimum(1.0, anomaly / 2.0)
+    labels = np.full(10000, np.nan)
+
+    config = calibrate(risk, anomaly, labels, alert_rate=0.02)
+
+    assert config["version"] == 1
+    assert config["risk_saturation_mse"] == np.quantile(anomaly, 0.99)
+    assert config["expected_alert_rate"] <= 0.02
+
+
+def test_small_alert_budget_is_not_swallowed_by_saturation():
+    rng = np.random.default_rng(2)
+    anomaly = rng.gamma(2.0, 0.3, size=20000)
+    risk = np.minimum(1.0, anomaly / 2.0)
+
+    config = calibrate(risk, anomaly, np.full(20000, np.nan), alert_rate=0.005)
+
+    assert config["high_risk_threshold"] < 1.0
+    assert 0.004 <= config["expected_alert_rate"] <= 0.005
+
+
+def test_unreachable_alert_budget_is_rejected():
+    # Heuristic-only scores with the top 10% tied
+    risk = np.r_[np.linspace(0.0, 0.5, 900), np.full(100, 0.9)]
+    with pytest.raises(ValueError):
+        calibrate(risk, np.full(1000, np.nan), np.full(1000, np.nan), alert_rate=0.05)
+    with pytest.raises(ValueError):
+        calibrate(risk, np.full(1000, np.nan), np.full(1000, np.nan), alert_rate=0.0)
+
+
+def test_min_precision_raises_threshold():
+    rng = np.random.default_rng(2)
+    anomaly = rng.random(2000)
+    risk = anomaly.copy()
+    labels = np.full(2000, np.nan)
+    # Only the very top of the labelled scores is actually fraud
+    labelled = rng.choice(2000, size=400, replace=False)
+    labels[labelled] = (anomaly[labelled] > 0.98).astype(float)
+
+    loose = calibrate(risk, np.full(2000, np.nan), labels, alert_rate=0.1)
+    strict = calibrate(risk, np.full(2000, np.nan), labels, alert_rate=0.1, min_precision=0.9)
+
+    assert strict["high_risk_threshold"] > loose["high_risk_threshold"]
+    assert strict["feedback"]["precision"] >= 0.9
+
+
+def test_save_keeps_previous_versions(tmp_path):
+    path = str(tmp_path / "thresholds.json")
+    assert load_thresholds(path)["version"] == 0
+
+    scores = np.linspace(0, 1, 100)
+    first = calibrate(scores, np.full(100, np.nan), np.full(100, np.nan), current=load_thresholds(path))
+    save_thresholds(first, path)
+    second = calibrate(scores, np.full(100, np.nan), np.full(100, np.nan), current=load_thresholds(path))
+    save_thresholds(second, path)
+
+    assert load_thresholds(path)["version"] == 2
+    assert load_thresholds(str(tmp_path / "thresholds.v1.json"))["version"] == 1
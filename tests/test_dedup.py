@@ -0,0 +1,90 @@
+import random
+import sqlite3
+
+from ml_pipeline import dedup
+from ml_pipeline.dedup import MinHashLSHIndex
+
+FORM = (
+    "Name of Patient: Jane Roe. Name of Doctor: Dr. Alan Grant. Hospital: St Mary General. "
+    "Date of admission 03 02 2025. Final Diagnosis: Fractured left tibia requiring surgical "
+    "fixation and two nights of observation. Procedures performed: open reduction internal "
+    "fixation, x-ray, anaesthesia. Total Claims: $4200.00"
+)
+
+
+def _random_form(rng):
+    words = ["patient", "doctor", "clinic", "fever", "cough", "xray", "blood", "test", "ward",
+             "review", "injection", "dressing", "consultation", "pharmacy", "scan", "therapy"]
+    return " ".join(rng.choice(words) for _ in range(60)) + f" total claims {rng.randint(10, 9999)}"
+
+
+def test_edited_copy_is_found_among_unrelated_claims(tmp_path):
+    rng = random.Random(0)
+    index = MinHashLSHIndex(str(tmp_path / "lsh.db"))
+    for claim_id in range(1, 501):
+        index.insert(claim_id, index.hasher.signature(_random_form(rng)))
+    index.insert(1000, index.hasher.signature(FORM))
+
+    edited = FORM.replace("$4200.00", "$4900.00").replace("03 02 2025", "05 02 2025")
+    matches = index.query(index.hasher.signature(edited))
+
+    assert [claim_id for claim_id, _ in matches] == [1000]
+    assert matches[0][1] >= 0.7
+
+
+def test_unrelated_text_has_no_duplicates(tmp_path):
+    index = MinHashLSHIndex(str(tmp_path / "lsh.db"))
+    index.insert(1, index.hasher.signature(FORM))
+    other = "Doctor: Dr. Smith. Diagnosis: Seasonal flu with mild dehydration, rest advised. Cost: $90"
+    assert index.query(index.hasher.signature(other)) == []
+    assert index.query(index.hasher.signature("")) == []
+
+
+def test_index_persists_across_instances(tmp_path):
+    path = str(tmp_path / "lsh.db")
+    index = MinHashLSHIndex(path)
+    index.insert(7, index.hasher.signature(FORM))
+    index.close()
+
+    reopened = MinHashLSHIndex(path)
+    assert [claim_id for claim_id, _ in reopened.query(reopened.hasher.signature(FORM))] == [7]
+
+
+def test_busy_bucket_returns_newest_claims(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, "MAX_CANDIDATES", 10)
+    index = MinHashLSHIndex(str(tmp_path / "lsh.db"))
+    signature = index.hasher.signature(FORM)
+    for claim_id in range(1, 51):
+        index.insert(claim_id, signature)
+
+    ids = [claim_id for claim_id, _ in index.query(signature)]
+    assert sorted(ids) == list(range(41, 51))
+
+
+def test_reinsert_does_not_duplicate_bucket_rows(tmp_path):
+    path = str(tmp_path / "lsh.db")
+    index = MinHashLSHIndex(path)
+    signature = index.hasher.signature(FORM)
+    index.insert(7, signature)
+    index.insert(7, signature)
+    index.close()
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT COUNT(*) FROM lsh_buckets WHERE claim_id = 7").fetchone()[0]
+    conn.close()
+    assert rows == index.bands
+
+
+def test_existing_index_with_duplicate_rows_is_migrated(tmp_path):
+    path = str(tmp_path / "lsh.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE lsh_buckets (band INTEGER, bucket INTEGER, claim_id INTEGER)")
+    conn.executemany("INSERT INTO lsh_buckets VALUES (?, ?, ?)", [(0, 5, 1), (0, 5, 1), (1, 6, 1)])
+    conn.commit()
+    conn.close()
+
+    MinHashLSHIndex(path).query(MinHashLSHIndex(path).hasher.signature(FORM))
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM lsh_buckets").fetchone()[0] == 2
+    conn.close()
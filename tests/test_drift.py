@@ -0,0 +1,38 @@
+import random
+
+from ml_pipeline.drift import DriftMonitor
+
+
+def _monitor():
+    return DriftMonitor(["cost", "doctor_frequency"], means=[300.0, 10.0], stds=[100.0, 5.0])
+
+
+def test_no_drift_on_reference_distribution():
+    rng = random.Random(0)
+    monitor = _monitor()
+    for _ in range(5000):
+        monitor.update({"cost": rng.gauss(300, 100), "doctor_frequency": rng.gauss(10, 5)})
+
+    report = monitor.report()
+    assert not report["retrain_recommended"]
+    assert report["features"]["cost"]["psi"] < 0.05
+    assert abs(report["features"]["cost"]["mean"] - 300) < 10
+
+
+def test_cost_shift_is_flagged():
+    rng = random.Random(1)
+    monitor = _monitor()
+    for _ in range(2000):
+        monitor.update({"cost": rng.gauss(600, 150), "doctor_frequency": rng.gauss(10, 5)})
+
+    report = monitor.report()
+    assert report["retrain_recommended"]
+    assert report["features"]["cost"]["drifted"]
+    assert not report["features"]["doctor_frequency"]["drifted"]
+
+
+def test_small_samples_are_not_flagged():
+    monitor = _monitor()
+    for _ in range(10):
+        monitor.update({"cost": 5000.0, "doctor_frequency": 0})
+    assert not monitor.report()["retrain_recommended"]
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from backend.app import api
+from backend.app.events import EventBroker, claims_event
+from backend.app.main import app
+
+VALID_HEADERS = {"x-api-key": "secret-token"}
+
+
+def _parse(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            continue
+        event_line, data_line = chunk.strip().split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_broker_drops_oldest_for_slow_subscriber():
+    broker = EventBroker(max_queue=2)
+    queue = broker.subscribe()
+    for n in range(3):
+        broker.publish("claims", n)
+    assert [queue.get_nowait()[1] for _ in range(2)] == [1, 2]
+    assert broker.dropped == 1
+
+
+def test_stream_sends_snapshot_then_only_uncounted_batches():
+    broker = EventBroker()
+    snapshot = {"total_claims": 1, "last_claim_id": 1}
+
+    async def scenario():
+        queue = broker.subscribe()
+        # Batch 1 was committed before the snapshot was read, batch 2 after
+        broker.publish("claims", claims_event([(1, {"doctor": "a", "diagnosis": "flu", "cost": 10.0}, 0.2, "Low Risk")]))
+        broker.publish("claims", claims_event([(2, {"doctor": "a", "diagnosis": "flu", "cost": 900.0}, 0.9, "High Risk")]))
+        checks = iter([False, False, True])
+
+        async def is_disconnected():
+            return next(checks)
+
+        chunks = [chunk async for chunk in broker.stream(queue, snapshot, is_disconnected)]
+        return chunks, broker.subscriber_count
+
+    chunks, subscribers = asyncio.run(scenario())
+    events = _parse(chunks)
+    assert [event_type for event_type, _ in events] == ["snapshot", "claims"]
+    delta = events[1][1]["delta"]
+    assert delta["total_claims"] == 1
+    assert delta["high_risk_claims"] == 1
+    assert delta["doctors"] == {"a": 1}
+    assert subscribers == 0
+
+
+def test_score_publishes_stored_claims():
+    queue = api.broker.subscribe()
+    try:
+        with TestClient(app) as client:
+            response = client.post("/score", json=[
+                {"doctor": "Dr. Live", "diagnosis": "Flu", "cost": 150.0},
+                {"doctor": "Dr. Live", "diagnosis": None, "cost": 150.0},
+            ], headers=VALID_HEADERS)
+        assert response.status_code == 200
+        event_type, data = queue.get_nowait()
+    finally:
+        api.broker.unsubscribe(queue)
+
+    assert event_type == "claims"
+    assert [claim["claim_id"] for claim in data["claims"]] == [response.json()[0]["claim_id"]]
+    assert data["last_claim_id"] == response.json()[0]["claim_id"]
+    assert data["delta"]["total_claims"] == 1
+
+
+def test_stats_reports_last_claim_id():
+    with TestClient(app) as client:
+        response = client.get("/stats", headers=VALID_HEADERS)
+    assert response.status_code == 200
+    assert "last_claim_id" in response.json()
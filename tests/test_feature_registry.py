@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import torch
+
+from ml_pipeline import predict
+from ml_pipeline.feature_registry import FeatureSchema, FeatureSchemaError, LEGACY_FEATURES, MODEL_FEATURES
+from ml_pipeline.models.autoencoder import Autoencoder
+
+
+def test_matrix_is_contiguous_float32_in_schema_order():
+    schema = FeatureSchema(("cost", "doctor_frequency", "cost_outlier_score"))
+    batch = [
+        {"cost": 100.0, "doctor_frequency": 2, "cost_outlier_score": -0.1, "pair_rarity": 9.0},
+        {"cost": 250.0, "doctor_frequency": 5, "cost_outlier_score": 0.2},
+    ]
+    matrix = schema.matrix(batch)
+
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(matrix, [[100.0, 2, -0.1], [250.0, 5, 0.2]], rtol=1e-6)
+    np.testing.assert_allclose(schema.vector(batch[0]), matrix[:1])
+
+
+def test_missing_inputs_rejected():
+    with pytest.raises(FeatureSchemaError, match="doctor_frequency"):
+        FeatureSchema(("cost", "doctor_frequency")).matrix([{"cost": 10.0}])
+
+
+def test_unknown_feature_rejected():
+    with pytest.raises(FeatureSchemaError):
+        FeatureSchema(("cost", "zodiac_sign"))
+
+
+def test_schema_roundtrip():
+    schema = FeatureSchema()
+    assert FeatureSchema.from_dict(schema.to_dict()) == schema
+    assert schema.names == MODEL_FEATURES
+
+
+def test_legacy_state_dict_loads_with_legacy_schema(tmp_path):
+    path = tmp_path / "autoencoder.pth"
+    torch.save(Autoencoder(len(LEGACY_FEATURES)).state_dict(), path)
+    _, schema = predict.load_checkpoint(str(path))
+    assert schema.names == LEGACY_FEATURES
+
+
+def test_mismatched_artifacts_rejected_at_load(tmp_path, monkeypatch):
+    from sklearn.preprocessing import StandardScaler
+    import joblib
+
+    model_path, scaler_path = tmp_path / "autoencoder.pth", tmp_path / "scaler.pkl"
+    schema = FeatureSchema()
+    torch.save({"state_dict": Autoencoder(schema.dim).state_dict(), "feature_schema": schema.to_dict()}, model_path)
+    # Scaler fitted on the legacy two inputs
+    joblib.dump(StandardScaler().fit(np.ones((4, 2))), scaler_path)
+    monkeypatch.setattr(predict, "MODEL_PATH", str(model_path))
+    monkeypatch.setattr(predict, "SCALER_PATH", str(scaler_path))
+
+    with pytest.raises(FeatureSchemaError):
+        predict.AnomalyDetector()
@@ -0,0 +1,58 @@
+import math
+import sqlite3
+
+from backend.app.repository import create_schema
+from ml_pipeline.features import compute_features
+from ml_pipeline.graph import CooccurrenceGraph
+
+
+def test_graph_features_from_grouped_rows():
+    graph = CooccurrenceGraph()
+    graph.load([("a", "flu", 8), ("a", "cold", 2), ("b", "flu", 10), ("b", "surgery", 0)])
+
+    features = graph.features("a", "flu")
+    assert features["doctor_frequency"] == 10
+    assert features["diagnosis_frequency"] == 18
+    assert features["pair_frequency"] == 8
+    assert features["doctor_diagnosis_share"] == 0.8
+
+    unseen = graph.features("a", "surgery")
+    assert unseen["pair_frequency"] == 0
+    # Rarer than independence predicts -> positive rarity, commoner -> negative
+    assert graph.features("b", "cold")["pair_rarity"] == math.log(2.0)
+    assert graph.features("a", "cold")["pair_rarity"] < 0
+    assert math.isclose(graph.features("x", "y")["pair_rarity"], 0.0)
+
+
+def test_graph_matches_full_history_counts(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "claims.db"))
+    create_schema(conn)
+    rows = [("a", "flu"), ("a", "flu"), ("a", "cold"), ("b", "flu"), (None, "flu"), ("b", None)]
+    conn.executemany("INSERT INTO claims (doctor, diagnosis, cost) VALUES (?, ?, 100)", rows)
+    graph = CooccurrenceGraph()
+    graph.load(conn.execute("SELECT doctor, diagnosis, COUNT(*) FROM claims GROUP BY doctor, diagnosis"))
+    conn.close()
+
+    features = compute_features({"doctor": "b", "diagnosis": "flu", "cost": 100.0}, graph=graph)
+    assert features["doctor_frequency"] == 2
+    assert features["diagnosis_frequency"] == 4
+    assert features["pair_frequency"] == 1
+    assert features["doctor_diagnosis_share"] == 0.5
+
+
+def test_incremental_updates():
+    graph = CooccurrenceGraph()
+    graph.add_claim({"doctor": "a", "diagnosis": "flu"})
+    graph.add_claim({"doctor": "a", "diagnosis": "flu"})
+    assert graph.features("a", "flu")["pair_frequency"] == 2
+    assert graph.total == 2
+
+
+def test_exclude_self_matches_graph_without_the_claim():
+    rows = [("a", "flu", 3), ("a", "cold", 1), ("b", "flu", 2)]
+    with_claim = CooccurrenceGraph()
+    with_claim.load(rows)
+    without_claim = CooccurrenceGraph()
+    without_claim.load([("a", "flu", 2), ("a", "cold", 1), ("b", "flu", 2)])
+
+    assert with_claim.features("a", "flu", exclude_self=True) == without_claim.features("a", "flu")
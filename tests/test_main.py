@@ -50,3 +50,229 @@ def test_unauthorized_access():
     # Try with invalid key
     response = client.get("/stats", headers={"x-api-key": "wrong-token"})
     assert response.status_code == 403
+
+@patch("backend.app.api.extract_text_from_file", side_effect=mock_extract_text)
+def test_predict_explain(mock_ocr):
+    files = {'file': ('test.pdf', b'dummy content', 'application/pdf')}
+
+    response = client.post("/predict?explain=true", files=files, headers=VALID_HEADERS)
+
+    assert response.status_code == 200
+    data = response.json()
+    from ml_pipeline.predict import detector
+    # The model artifacts are committed, so explanations must be present
+    assert detector.model is not None
+    assert data["status"] == "Complete"
+    assert set(data["explanation"]) == set(detector.feature_names)
+    assert sum(data["explanation"].values()) > 0
+
+def test_explain_contributions_sum_to_score():
+    from ml_pipeline.predict import detector
+    features = {"cost": 900.0, "doctor_frequency": 1, "diagnosis_frequency": 3, "cost_outlier_score": -0.1}
+    score, contributions = detector.explain(features)
+    assert contributions is not None
+    assert score == pytest.approx(detector.predict(features), rel=1e-5)
+    assert sum(contributions.values()) == pytest.approx(score, rel=1e-5)
+
+def test_explain_costs_one_forward_pass_like_predict():
+    from ml_pipeline.predict import detector
+    features = {"cost": 900.0, "doctor_frequency": 1, "diagnosis_frequency": 3, "cost_outlier_score": -0.1}
+    calls = []
+    hook = detector.model.register_forward_hook(lambda *_: calls.append(1))
+    try:
+        detector.predict(features)
+        predict_passes = len(calls)
+        detector.explain(features)
+    finally:
+        hook.remove()
+    assert predict_passes == 1
+    assert len(calls) - predict_passes == 1
+
+def test_explain_batch_matches_explain_in_one_forward_pass():
+    from ml_pipeline.predict import detector
+    batch = [
+        {"cost": 900.0, "doctor_frequency": 1, "diagnosis_frequency": 3, "cost_outlier_score": -0.1},
+        {"cost": 120.0, "doctor_frequency": 40, "diagnosis_frequency": 80, "cost_outlier_score": 0.2},
+        {"cost": 5000.0, "doctor_frequency": 0, "diagnosis_frequency": 1, "cost_outlier_score": -0.3},
+    ]
+    calls = []
+    hook = detector.model.register_forward_hook(lambda *_: calls.append(1))
+    try:
+        scores, contributions = detector.explain_batch(batch)
+    finally:
+        hook.remove()
+    assert len(calls) == 1
+    for features, score, contribution in zip(batch, scores, contributions):
+        single_score, single_contribution = detector.explain(features)
+        assert score == pytest.approx(single_score, rel=1e-5)
+        assert contribution == pytest.approx(single_contribution, rel=1e-5)
+
+def test_score_bulk_explain():
+    claims = [
+        {"doctor": "a", "diagnosis": "flu", "cost": 120.0},
+        {"doctor": "b", "diagnosis": None, "cost": 80.0},
+    ]
+    response = client.post("/score", params={"explain": True}, json=claims, headers=VALID_HEADERS)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["explanation"] is not None
+    assert data[1]["explanation"] is None
+
+@patch("backend.app.api.MAX_UPLOAD_BYTES", 16)
+def test_predict_rejects_oversized_upload():
+    files = {'file': ('test.pdf', b'x' * 64, 'application/pdf')}
+    response = client.post("/predict", files=files, headers=VALID_HEADERS)
+    assert response.status_code == 413
+
+def test_upload_limit_middleware_rejects_large_body():
+    from backend.app.admission import MAX_UPLOAD_BYTES
+    files = {'file': ('test.pdf', b'x' * (MAX_UPLOAD_BYTES + 128 * 1024), 'application/pdf')}
+    response = client.post("/predict", files=files, headers=VALID_HEADERS)
+    assert response.status_code == 413
+
+def test_upload_limit_middleware_rejects_malformed_content_length():
+    import asyncio
+    from backend.app.admission import UploadLimitMiddleware
+
+    async def app(scope, receive, send):
+        raise AssertionError("app must not run with a malformed Content-Length")
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=x"), (b"content-length", b"lots")]
+    scope = {"type": "http", "method": "POST", "path": "/predict", "headers": headers}
+    asyncio.run(UploadLimitMiddleware(app)(scope, receive, send))
+
+    assert sent[0]["status"] == 400
+
+def test_predict_rejects_when_queue_full():
+    from backend.app.admission import admission
+    capacity = admission.max_concurrent + admission.max_queued
+    admission.admitted += capacity
+    try:
+        files = {'file': ('test.pdf', b'dummy content', 'application/pdf')}
+        response = client.post("/predict", files=files, headers=VALID_HEADERS)
+    finally:
+        admission.admitted -= capacity
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+    stats = client.get("/metrics/admission", headers=VALID_HEADERS).json()
+    assert stats["rejected_queue_full"] >= 1
+    assert stats["queue_depth"] == 0
+    assert stats["admitted"] == 0
+
+def test_queue_full_rejected_before_body_is_read():
+    import asyncio
+    from backend.app.admission import AdmissionController, AdmissionMiddleware
+
+    async def app(scope, receive, send):
+        raise AssertionError("app must not run when the queue is full")
+
+    controller = AdmissionController(max_concurrent=1, max_queued=0)
+    controller.admit()
+    body_reads, sent = [], []
+
+    async def receive():
+        body_reads.append(1)
+        return {"type": "http.request", "body": b"x" * 1024, "more_body": True}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/predict", "headers": []}
+    asyncio.run(AdmissionMiddleware(app, controller)(scope, receive, send))
+
+    assert body_reads == []
+    assert sent[0]["status"] == 503
+    assert controller.rejected_queue_full == 1
+    assert controller.admitted == 1
+
+def test_queue_depth_counts_only_waiting_requests():
+    import asyncio
+    from backend.app.admission import AdmissionController
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queued=4)
+        controller.admit()
+        controller.admit()
+        release = asyncio.Event()
+
+        async def extract():
+            async with controller.extraction_slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(extract()) for _ in range(2)]
+        await asyncio.sleep(0)
+        during = controller.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return during, controller.stats()
+
+    during, after = asyncio.run(scenario())
+    assert (during["in_flight"], during["queue_depth"], during["admitted"]) == (1, 1, 2)
+    assert (after["in_flight"], after["queue_depth"]) == (0, 0)
+
+def test_drift_endpoint():
+    from ml_pipeline.predict import detector
+    before = client.get("/drift", headers=VALID_HEADERS)
+    # The committed scaler is the training reference, so the monitor is always on
+    assert before.status_code == 200
+    assert set(before.json()["features"]) == set(detector.feature_names)
+
+    client.post("/score", json={"doctor": "Dr. Drift", "diagnosis": "Flu", "cost": 300.0}, headers=VALID_HEADERS)
+    after = client.get("/drift", headers=VALID_HEADERS).json()
+    assert after["features"]["cost"]["count"] == before.json()["features"]["cost"]["count"] + 1
+    assert isinstance(after["retrain_recommended"], bool)
+
+@patch("backend.app.api.extract_text_from_file", side_effect=mock_extract_text)
+def test_predict_flags_near_duplicate_submission(mock_ocr):
+    files = {'file': ('test.pdf', b'dummy content', 'application/pdf')}
+    first = client.post("/predict", files=files, headers=VALID_HEADERS).json()
+    second = client.post("/predict", files=files, headers=VALID_HEADERS).json()
+
+    assert first["claim_id"] in second["near_duplicate_ids"]
+    assert second["features"]["near_duplicate_count"] >= 1
+
+def test_thresholds_endpoint():
+    response = client.get("/thresholds", headers=VALID_HEADERS)
+    assert response.status_code == 200
+    assert "high_risk_threshold" in response.json()
+
+def test_score_single_claim():
+    claim = {"doctor": "Dr House", "diagnosis": "Lupus", "cost": 500.0}
+    response = client.post("/score", json=claim, headers=VALID_HEADERS)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "Complete"
+    assert data["claim_id"] is not None
+    assert data["entities"]["doctor"] == "dr house"
+    assert 0.0 <= data["risk_score"] <= 1.0
+
+def test_score_bulk_matches_single_and_skips_incomplete():
+    claims = [
+        {"doctor": "a", "diagnosis": "flu", "cost": 120.0},
+        {"doctor": "b", "diagnosis": None, "cost": 80.0},
+        {"doctor": "c", "diagnosis": "cold", "cost": 9000.0},
+    ]
+    response = client.post("/score", json=claims, headers=VALID_HEADERS)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data] == ["Complete", "Incomplete", "Complete"]
+    assert data[1]["claim_id"] is None
+    assert "Missing Diagnosis" in data[1]["issues"]
+    assert data[2]["claim_id"] == data[0]["claim_id"] + 1
+
+def test_score_rejects_oversized_batch():
+    with patch("backend.app.api.MAX_SCORE_BATCH", 2):
+        response = client.post("/score", json=[{"cost": 1.0}] * 3, headers=VALID_HEADERS)
+    assert response.status_code == 413
@@ -0,0 +1,316 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+
+from backend.app import api
+from backend.app.main import app
+import pytest
+
+from backend.app.repository import ClaimRepository, SQLiteClaimRepository, create_repository
+from ml_pipeline.graph import CooccurrenceGraph
+from ml_pipeline.sketches import PeerCostIndex
+
+VALID_HEADERS = {"x-api-key": "secret-token"}
+
+
+def _claim(doctor="a", diagnosis="flu", cost=120.0, risk_score=0.1, prediction="Low Risk"):
+    return ({"doctor": doctor, "diagnosis": diagnosis, "cost": cost}, risk_score, prediction, None)
+
+
+def test_sqlite_repository_roundtrip(tmp_path):
+    async def scenario():
+        repo = create_repository("sqlite", path=str(tmp_path / "claims.db"))
+        await repo.init()
+        [claim_id] = await repo.save_claims([_claim(risk_score=0.7, prediction="High Risk")])
+        await repo.set_feedback(claim_id, True)
+        stats = await repo.get_stats(0.6)
+        peer_index, graph = PeerCostIndex(), CooccurrenceGraph()
+        last_claim_id = await repo.get_history(peer_index, graph)
+        await repo.close()
+        return claim_id, stats, last_claim_id, peer_index, graph
+
+    claim_id, stats, last_claim_id, peer_index, graph = asyncio.run(scenario())
+    assert claim_id == 1
+    assert stats["total_claims"] == 1
+    assert stats["high_risk_claims"] == 1
+    assert last_claim_id == 1
+    assert peer_index.sketches["diagnosis"]["flu"].n == 1
+    assert graph.pair_count("a", "flu") == 1
+
+
+def test_incomplete_backend_fails_when_built():
+    class NoHistoryRepository(ClaimRepository):
+        async def init(self):
+            pass
+
+    with pytest.raises(TypeError, match="get_history"):
+        NoHistoryRepository()
+
+
+def test_db_work_does_not_block_event_loop(tmp_path):
+    repo = SQLiteClaimRepository(path=str(tmp_path / "claims.db"))
+
+    async def scenario():
+        ticks = 0
+        slow = asyncio.ensure_future(repo._run(lambda conn: time.sleep(0.3)))
+        while not slow.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        await repo.close()
+        return ticks
+
+    # The loop keeps running other work while the DB thread is busy
+    assert asyncio.run(scenario()) > 10
+
+
+def test_handlers_do_not_serialize_on_db_io(monkeypatch):
+    original = api.repository.get_stats
+
+    async def slow_stats(threshold):
+        await api.repository._run(lambda conn: time.sleep(0.5))
+        return await original(threshold)
+
+    monkeypatch.setattr(api.repository, "get_stats", slow_stats)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            finished = {}
+
+            async def timed(name, path):
+                response = await client.get(path, headers=VALID_HEADERS)
+                finished[name] = time.perf_counter()
+                return response
+
+            start = time.perf_counter()
+            stats, admission = await asyncio.gather(
+                timed("stats", "/stats"), timed("admission", "/metrics/admission")
+            )
+            return start, finished, stats, admission
+
+    start, finished, stats, admission = asyncio.run(scenario())
+    assert stats.status_code == 200 and admission.status_code == 200
+    assert finished["admission"] - start < 0.25
+    assert finished["admission"] < finished["stats"]
+
+
+def test_slow_read_does_not_delay_other_db_handlers(monkeypatch):
+    original = api.repository.get_stats
+
+    async def slow_stats(threshold, top_n=5):
+        # Hold one reader connection busy, as a slow aggregate or export page would
+        await api.repository._run(lambda conn: time.sleep(0.5))
+        return await original(threshold, top_n)
+
+    monkeypatch.setattr(api.repository, "get_stats", slow_stats)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Warm up: cost outlier model and DB threads
+            await client.post("/score", json={"doctor": "warm", "diagnosis": "flu", "cost": 10.0}, headers=VALID_HEADERS)
+            finished = {}
+
+            async def timed(name, method, path, **kwargs):
+                response = await client.request(method, path, headers=VALID_HEADERS, **kwargs)
+                finished[name] = time.perf_counter()
+                return response
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                timed("stats", "GET", "/stats"),
+                timed("score", "POST", "/score", json={"doctor": "a", "diagnosis": "flu", "cost": 100.0}),
+                timed("claims", "GET", "/claims", params={"limit": 5}),
+            )
+            return start, finished, responses
+
+    start, finished, responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    # The insert and the other read each use their own connection
+    assert finished["score"] - start < 0.3
+    assert finished["claims"] - start < 0.3
+    assert finished["stats"] - start >= 0.5
+
+
+def test_connection_failure_fails_jobs_instead_of_hanging():
+    repo = SQLiteClaimRepository(path="/proc/nope/claims.db")
+
+    async def scenario():
+        errors = []
+        for call in (repo.get_stats(0.5), repo.save_claims([_claim()])):
+            try:
+                await asyncio.wait_for(call, timeout=5)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                errors.append(e)
+        await asyncio.wait_for(repo.close(), timeout=5)
+        return errors
+
+    assert len(asyncio.run(scenario())) == 2
+
+
+def _transactions(statements):
+    """
+    Count the transactions a statement trace really committed: COMMITs,
+    plus RELEASEs of a savepoint that was not nested in a BEGIN.
+    """
+    committed, open_transaction = 0, False
+    for statement in statements:
+        verb = statement.split()[0].upper()
+        if verb == "BEGIN":
+            open_transaction = True
+        elif verb in ("COMMIT", "ROLLBACK") and statement.split()[1:2] != ["TO"]:
+            committed += verb == "COMMIT"
+            open_transaction = False
+        elif verb == "RELEASE" and not open_transaction:
+            committed += 1
+    return committed
+
+
+class TracedRepository(SQLiteClaimRepository):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+
+    def _connect(self):
+        conn = super()._connect()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def test_concurrent_inserts_share_commits_and_get_real_ids(tmp_path):
+    async def scenario():
+        repo = TracedRepository(path=str(tmp_path / "claims.db"), commit_window_ms=20)
+        await repo.init()
+        repo.statements.clear()
+        ids = await asyncio.gather(*[
+            repo.save_claims([_claim(cost=float(i))])
+            for i in range(50)
+        ])
+        await repo.close()
+        return [claim_ids[0] for claim_ids in ids], repo.statements
+
+    ids, statements = asyncio.run(scenario())
+    assert sorted(ids) == list(range(1, 51))
+    assert sum(statement.startswith("RELEASE") for statement in statements) == 50
+    assert _transactions(statements) < 10
+
+
+def test_group_commit_counts_rows_not_jobs(tmp_path):
+    async def scenario():
+        repo = TracedRepository(path=str(tmp_path / "claims.db"), commit_window_ms=200, commit_max_rows=10)
+        await repo.init()
+        repo.statements.clear()
+        await asyncio.gather(repo.save_claims([_claim()] * 10), repo.save_claims([_claim()]), repo.save_claims([_claim()]))
+        await repo.close()
+        return repo.statements
+
+    # The 10-row job fills a batch on its own; the two small ones share the next
+    assert _transactions(asyncio.run(scenario())) == 2
+
+
+def test_failed_write_job_leaves_nothing_behind(tmp_path):
+    path = str(tmp_path / "claims.db")
+
+    async def scenario():
+        repo = SQLiteClaimRepository(path=path, commit_window_ms=50)
+        await repo.init()
+        good = ({"doctor": "a", "diagnosis": "flu", "cost": 1.0}, 0.1, "Low Risk", None)
+        # An unbindable value makes the second insert fail after the first ran
+        bad = ({"doctor": object(), "diagnosis": "flu", "cost": 1.0}, 0.1, "Low Risk", None)
+        results = await asyncio.gather(
+            repo.save_claims([good, bad]), repo.save_claims([good]), return_exceptions=True
+        )
+        await repo.close()
+        return results
+
+    failed, neighbour = asyncio.run(scenario())
+    assert isinstance(failed, sqlite3.Error)
+    assert len(neighbour) == 1
+    conn = sqlite3.connect(path)
+    # Only the neighbouring job in the same group commit is stored
+    assert conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 1
+    conn.close()
+
+
+def test_close_flushes_queued_writes(tmp_path):
+    path = str(tmp_path / "claims.db")
+
+    async def scenario():
+        repo = SQLiteClaimRepository(path=path, commit_window_ms=1000)
+        await repo.init()
+        pending = [
+            asyncio.ensure_future(repo.save_claims([_claim(cost=1.0)]))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        await repo.close()
+        return [claim_ids[0] for claim_ids in await asyncio.gather(*pending)]
+
+    ids = asyncio.run(scenario())
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 5
+    conn.close()
+    assert len(set(ids)) == 5
+
+
+def test_feedback_batch_endpoint():
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+
+    async def insert():
+        return await api.repository.save_claims([_claim("b", "cold", 10.0, 0.2)] * 3)
+
+    claim_ids = asyncio.run(insert())
+    items = [{"claim_id": claim_id, "is_fraud": True} for claim_id in claim_ids] + [{"claim_id": 10**9, "is_fraud": False}]
+    response = client.post("/feedback/batch", json={"items": items}, headers=VALID_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json()["updated"] == 3
+
+
+def test_concurrent_requests_refit_cost_outlier_model_once(monkeypatch):
+    fits = []
+
+    class CountingModel(api.CostOutlierModel):
+        def __init__(self, costs):
+            fits.append(len(costs))
+            time.sleep(0.05)
+            super().__init__(costs)
+
+    monkeypatch.setattr(api, "CostOutlierModel", CountingModel)
+    monkeypatch.setattr(api, "cost_outlier_model", None)
+    monkeypatch.setattr(api, "cost_outlier_refit_lock", asyncio.Lock())
+
+    async def scenario():
+        return await asyncio.gather(*[api.get_cost_outlier_model() for _ in range(5)])
+
+    models = asyncio.run(scenario())
+    assert len(fits) == 1
+    assert all(model is models[0] for model in models)
+
+
+def test_history_reload_replays_claims_stored_meanwhile(monkeypatch):
+    stored_meanwhile = {"doctor": "late", "diagnosis": "flu", "cost": 75.0}
+
+    class SlowHistoryRepository:
+        async def get_history(self, peer_index, graph):
+            peer_index.load([("early", "flu", 50.0)])
+            graph.load([("early", "flu", 1)])
+            # A claim the snapshot did not see is stored while the rows load
+            api.history_backlog.append((100, stored_meanwhile))
+            return 99
+
+    monkeypatch.setattr(api, "repository", SlowHistoryRepository())
+    monkeypatch.setattr(api, "history_reload_lock", asyncio.Lock())
+    monkeypatch.setattr(api, "peer_index", api.peer_index)
+    monkeypatch.setattr(api, "graph", api.graph)
+
+    assert asyncio.run(api.load_history()) == 99
+    assert api.graph.total == 2
+    assert api.graph.pair_count("late", "flu") == 1
+    assert set(api.peer_index.sketches["doctor"]) == {"early", "late"}
+    assert api.history_backlog is None
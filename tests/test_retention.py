@@ -0,0 +1,109 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.repository import create_repository, create_schema
+from backend.app.retention import archive_claims
+
+VALID_HEADERS = {"x-api-key": "secret-token"}
+
+
+@pytest.fixture
+def claims_db(tmp_path):
+    path = str(tmp_path / "claims.db")
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    old = "datetime('now', '-200 days')"
+    conn.executemany(
+        f"INSERT INTO claims (doctor, diagnosis, cost, risk_score, prediction, created_at) VALUES (?, ?, ?, ?, ?, {old})",
+        [("a", "flu", 100.0, 0.9, "High Risk"), ("a", "flu", 200.0, 0.1, "Low Risk"), ("b", "cold", 50.0, 0.2, "Low Risk")],
+    )
+    conn.execute("INSERT INTO claims (doctor, diagnosis, cost, risk_score, prediction) VALUES ('b', 'flu', 80.0, 0.8, 'High Risk')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _stats_and_claims(path):
+    async def scenario():
+        repo = create_repository("sqlite", path=path)
+        await repo.init()
+        stats = await repo.get_stats(0.5)
+        hot = await repo.get_claims()
+        everything = await repo.get_claims(include_archive=True)
+        await repo.close()
+        return stats, hot, everything
+
+    return asyncio.run(scenario())
+
+
+def test_archive_moves_old_claims_and_keeps_stats(claims_db):
+    before, _, _ = _stats_and_claims(claims_db)
+
+    summary = archive_claims(claims_db, days=90, chunk_size=2, log=lambda *_: None)
+    assert summary["moved"] == 3
+
+    after, hot, everything = _stats_and_claims(claims_db)
+    assert [claim["id"] for claim in hot] == [4]
+    assert [(claim["id"], claim["archived"]) for claim in everything] == [(4, False), (3, True), (2, True), (1, True)]
+    for key in ("total_claims", "high_risk_claims", "low_risk_claims", "top_doctors", "top_diagnoses"):
+        assert after[key] == before[key]
+    assert after["average_risk_score"] == pytest.approx(before["average_risk_score"])
+
+    conn = sqlite3.connect(claims_db)
+    rollups = conn.execute("SELECT doctor, diagnosis, claims, cost_sum, high_risk FROM claim_rollups ORDER BY doctor").fetchall()
+    conn.close()
+    assert rollups == [("a", "flu", 2, 300.0, 1), ("b", "cold", 1, 50.0, 0)]
+
+
+def test_archive_is_idempotent(claims_db):
+    archive_claims(claims_db, days=90, log=lambda *_: None)
+    assert archive_claims(claims_db, days=90, log=lambda *_: None)["moved"] == 0
+    stats, _, everything = _stats_and_claims(claims_db)
+    assert stats["total_claims"] == 4
+    assert len(everything) == 4
+
+
+def test_claims_explorer_and_export():
+    with TestClient(app) as client:
+        client.post("/score", json={"doctor": "Dr. Explorer", "diagnosis": "Flu", "cost": 120.0}, headers=VALID_HEADERS)
+        page = client.get("/claims", params={"doctor": "dr explorer", "include_archive": True}, headers=VALID_HEADERS)
+        export = client.get("/claims/export", params={"doctor": "dr explorer"}, headers=VALID_HEADERS)
+        too_big = client.get("/claims", params={"limit": 100000}, headers=VALID_HEADERS)
+
+    assert page.status_code == 200
+    assert page.json()[0]["doctor"] == "dr explorer"
+    assert page.json()[0]["archived"] is False
+    assert export.status_code == 200
+    assert export.headers["content-type"].startswith("text/csv")
+    lines = export.text.strip().splitlines()
+    assert lines[0].startswith("id,doctor,diagnosis")
+    assert len(lines) == 1 + len(page.json())
+    assert too_big.status_code == 422
+
+
+def test_history_reload_and_feedback_after_archiving(claims_db, monkeypatch):
+    from backend.app import api
+
+    monkeypatch.setattr(api, "repository", create_repository("sqlite", path=claims_db))
+    # Startup and the reload replace these; put the originals back afterwards
+    monkeypatch.setattr(api, "peer_index", api.peer_index)
+    monkeypatch.setattr(api, "graph", api.graph)
+    with TestClient(app) as client:
+        assert api.graph.total == 4
+        archive_claims(claims_db, days=90, log=lambda *_: None)
+
+        archived = client.post("/feedback", json={"claim_id": 1, "is_fraud": True}, headers=VALID_HEADERS)
+        hot = client.post("/feedback", json={"claim_id": 4, "is_fraud": True}, headers=VALID_HEADERS)
+        reload = client.post("/admin/reload-history", headers=VALID_HEADERS)
+
+        assert api.graph.total == 1
+        assert set(api.peer_index.sketches["doctor"]) == {"b"}
+
+    assert archived.status_code == 404
+    assert hot.status_code == 200
+    assert reload.status_code == 200
+    assert reload.json()["last_claim_id"] == 4
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from ml_pipeline.features import compute_features
+from ml_pipeline.sketches import KLLSketch, PeerCostIndex
+
+
+def test_kll_percentile_accuracy_with_bounded_memory():
+    rng = random.Random(0)
+    sketch = KLLSketch(k=128, seed=0)
+    values = [rng.uniform(0, 1000) for _ in range(50000)]
+    for value in values:
+        sketch.update(value)
+
+    assert sketch.n == 50000
+    # Memory stays bounded far below the number of inserted values
+    assert sum(len(c) for c in sketch.compactors) < 1000
+    for q in (0.1, 0.5, 0.9):
+        assert abs(sketch.percentile(q * 1000) - q) < 0.03
+
+
+def test_kll_merge_matches_single_sketch():
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    for value in range(5000):
+        (left if value % 2 else right).update(value)
+    left.merge(right)
+
+    assert left.n == 5000
+    assert abs(left.percentile(2500) - 0.5) < 0.03
+
+
+def test_peer_percentile_depends_on_diagnosis_group():
+    index = PeerCostIndex()
+    index.load([("a", "flu", c) for c in range(50, 150)])
+    index.load([("b", "surgery", c) for c in range(1000, 5000, 10)])
+
+    flu = compute_features({"doctor": "a", "diagnosis": "flu", "cost": 2000.0}, peer_index=index)
+    surgery = compute_features({"doctor": "b", "diagnosis": "surgery", "cost": 2000.0}, peer_index=index)
+    unknown = compute_features({"doctor": "c", "diagnosis": "cold", "cost": 2000.0}, peer_index=index)
+
+    assert flu["diagnosis_cost_percentile"] == 1.0
+    assert 0.2 < surgery["diagnosis_cost_percentile"] < 0.3
+    assert unknown["diagnosis_cost_percentile"] == 0.5
+    assert unknown["doctor_cost_percentile"] == 0.5
+
+
+def test_peer_percentile_exclude_self():
+    index = PeerCostIndex()
+    index.load([("a", "flu", float(cost)) for cost in range(1, 11)])
+    others = PeerCostIndex()
+    others.load([("a", "flu", float(cost)) for cost in range(1, 11) if cost != 5])
+
+    assert index.percentile("diagnosis", "flu", 5.0, exclude_self=True) == pytest.approx(
+        others.percentile("diagnosis", "flu", 5.0)
+    )
+    lonely = PeerCostIndex()
+    lonely.load([("a", "rare", 10.0)])
+    assert lonely.percentile("diagnosis", "rare", 10.0, exclude_self=True) is None